@@ -0,0 +1,383 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+
+# End-to-end latency benchmark of the agent pipelines against a scripted local Ollama stand-in.
+#
+#   python benchmark/run.py --pipelines sampleAgent drawAgent test --runs 3 --output results.json
+#
+# Each run starts the pipeline in a fresh process and working directory (cold caches), times
+# startup and the proper-noun index build, then answers every question in questions.jsonl,
+# timing each LLM call, each tool call and the whole question.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIPELINES = {
+    "sampleAgent": os.path.join(ROOT, "sampleAgent"),
+    "drawAgent": os.path.join(ROOT, "drawAgent"),
+    "test": os.path.join(ROOT, "scripts"),
+}
+QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.jsonl")
+
+# Tools that run SQL in each pipeline; "sql" steps go to whichever one the agent offers
+QUERY_TOOLS = ("sql_db_query", "query_as_list")
+MODEL = "llama3.1:latest"
+
+def read_questions(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ScriptedModel:
+    """Stub model that plays back each question's steps, one step per chat request.
+
+    Steps call the query tool, call another tool, or answer. Steps for tools the pipeline
+    does not offer are skipped, so the same script drives every pipeline.
+    """
+
+    def __init__(self, questions):
+        self.steps = {q["question"]: q["steps"] for q in questions}
+
+    def available(self, step, names):
+        if "sql" in step:
+            return any(name in names for name in QUERY_TOOLS)
+        return "tool" not in step or step["tool"] in names
+
+    def __call__(self, messages, tools):
+        names = {t["function"]["name"] for t in tools or []}
+        asked = max(i for i, m in enumerate(messages) if m["role"] == "user")
+        steps = [step for step in self.steps.get(messages[asked]["content"], []) if self.available(step, names)]
+        done = sum(1 for m in messages[asked + 1:] if m["role"] == "assistant")
+        step = steps[done] if done < len(steps) else {"answer": "I could not find an answer."}
+        if "answer" in step:
+            return {"role": "assistant", "content": step["answer"]}
+        if "sql" in step:
+            name, args = next(name for name in QUERY_TOOLS if name in names), {"query": step["sql"]}
+        else:
+            name, args = step["tool"], step["args"]
+        return {"role": "assistant", "content": "", "tool_calls": [{"function": {"name": name, "arguments": args}}]}
+
+
+def percentile(values, p):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "p50": round(percentile(samples, 50), 4),
+        "p95": round(percentile(samples, 95), 4),
+        "mean": round(sum(samples) / len(samples), 4),
+    }
+
+
+# ---- worker: runs inside the pipeline's process ----
+
+def make_timer():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class StageTimer(BaseCallbackHandler):
+        """Collects the duration of every LLM and tool call made while answering"""
+
+        def __init__(self):
+            self.started = {}
+            self.events = []
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self.started[run_id] = ("llm", time.perf_counter())
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self.started[run_id] = ("llm", time.perf_counter())
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+            self.started[run_id] = (f"tool:{(serialized or {}).get('name') or kwargs.get('name')}", time.perf_counter())
+
+        def _end(self, run_id):
+            if run_id in self.started:
+                stage, start = self.started.pop(run_id)
+                self.events.append((stage, time.perf_counter() - start))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._end(run_id)
+
+    return StageTimer()
+
+def time_index_build(timings):
+    """Wrap the pipeline's load_vector_db so building or loading the FAISS index is timed"""
+    import embeddings
+
+    load_vector_db = embeddings.load_vector_db
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return load_vector_db(*args, **kwargs)
+        finally:
+            timings["index_build"] = time.perf_counter() - start
+
+    embeddings.load_vector_db = timed
+
+def answer_langgraph(agent, question):
+    from langchain_core.messages import HumanMessage
+
+    timer = make_timer()
+    result = agent.invoke({"messages": [HumanMessage(content=question)]}, config={"callbacks": [timer]})
+    return result["messages"][-1].content, timer.events
+
+def run_worker(args):
+    start = time.perf_counter()
+    timings = {"index_build": None}
+    questions = read_questions(args.questions)
+    results = []
+
+    if args.pipeline == "test":
+        import test as pipeline
+
+        async def answer_all():
+            engine = pipeline.build_engine()
+            timings["startup"] = time.perf_counter() - start
+            try:
+                for _ in range(args.repeat):
+                    for record in questions:
+                        began = time.perf_counter()
+                        try:
+                            text, stats = await pipeline.answer(record["question"], engine)
+                            events = [("llm", s) for s in stats["llm_calls"]]
+                            events += [(f"tool:{t['tool']}", t["seconds"]) for t in stats["tools"]]
+                            results.append({"id": record["id"], "answer": text, "events": events})
+                        except Exception as e:
+                            results.append({"id": record["id"], "error": f"{type(e).__name__}: {e}", "events": []})
+                        results[-1]["total"] = time.perf_counter() - began
+            finally:
+                engine.close()
+
+        asyncio.run(answer_all())
+    else:
+        time_index_build(timings)
+        if args.pipeline == "sampleAgent":
+            from app import build_agent
+
+            agent = build_agent()
+        else:
+            import config  # noqa: F401
+            from agent import agent
+        timings["startup"] = time.perf_counter() - start
+
+        for _ in range(args.repeat):
+            for record in questions:
+                began = time.perf_counter()
+                try:
+                    text, events = answer_langgraph(agent, record["question"])
+                    results.append({"id": record["id"], "answer": text, "events": events})
+                except Exception as e:
+                    results.append({"id": record["id"], "error": f"{type(e).__name__}: {e}", "events": []})
+                results[-1]["total"] = time.perf_counter() - began
+
+    if args.pipeline == "drawAgent":
+        # Let queued charts finish so the render workers exit with this process
+        from tools import renderer
+
+        renderer.shutdown()
+    with open(args.output, "w") as f:
+        json.dump({**timings, "questions": results}, f)
+
+
+# ---- runner ----
+
+def start_stub(questions, args):
+    sys.path.insert(0, PIPELINES["sampleAgent"])
+    from aiohttp import web
+    from fake_ollama import FakeOllama
+
+    server = FakeOllama(
+        reply=ScriptedModel(questions),
+        models=(MODEL,),
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        embed_latency=args.embed_latency,
+    )
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(server.app())
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", args.port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{args.port}"
+
+def pipeline_env(pipeline, host, workdir):
+    return dict(
+        os.environ,
+        PYTHONPATH=PIPELINES[pipeline],
+        OLLAMA_HOST=host,
+        OPENAI_BASE_URL=f"{host}/v1",
+        OPENAI_API_KEY="benchmark",
+        LANGCHAIN_TRACING_V2="false",
+        EMBEDDINGS_BACKEND="ollama",
+        OLLAMA_EMBED_MODEL=MODEL,
+        # Measure the agents, not their response and plan caches
+        LLM_CACHE="0",
+        PLAN_CACHE="0",
+        OLLAMAOPS_CACHE_DIR=os.path.join(workdir, ".cache"),
+        CHARTS_DIR=os.path.join(workdir, "charts"),
+    )
+
+def run_pipeline(pipeline, host, args):
+    """Run the pipeline args.runs times, each in a new process and working directory"""
+    runs = []
+    for number in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix=f"bench-{pipeline}-")
+        try:
+            shutil.copy(os.path.join(ROOT, "Chinook.db"), workdir)
+            output = os.path.join(workdir, "result.json")
+            command = [
+                sys.executable, os.path.abspath(__file__), "worker",
+                "--pipeline", pipeline, "--questions", os.path.abspath(args.questions),
+                "--repeat", str(args.repeat), "--output", output,
+            ]
+            start = time.perf_counter()
+            process = subprocess.run(
+                command, cwd=workdir, env=pipeline_env(pipeline, host, workdir),
+                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=args.timeout,
+            )
+            if process.returncode != 0 or not os.path.exists(output):
+                error = (process.stderr.strip().splitlines() or ["no output"])[-1]
+                print(f"  run {number + 1}: failed: {error}")
+                runs.append({"error": error})
+                continue
+            with open(output) as f:
+                run = json.load(f)
+            run["process_seconds"] = time.perf_counter() - start
+            failed = sum("error" in q for q in run["questions"])
+            print(f"  run {number + 1}: startup {run['startup']:.2f}s, {len(run['questions'])} answers, {failed} errors")
+            runs.append(run)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return runs
+
+def stage_samples(runs):
+    samples = {}
+    for run in runs:
+        if "error" in run:
+            continue
+        samples.setdefault("startup", []).append(run["startup"])
+        if run.get("index_build") is not None:
+            samples.setdefault("index_build", []).append(run["index_build"])
+        for question in run["questions"]:
+            samples.setdefault("total", []).append(question["total"])
+            for stage, seconds in question["events"]:
+                samples.setdefault(stage, []).append(seconds)
+    return samples
+
+def compare(results, baseline, tolerance):
+    """Print p50/p95 changes against a saved result; returns the regressions beyond tolerance"""
+    regressions = []
+    for pipeline, result in results["pipelines"].items():
+        for stage, now in result["stages"].items():
+            before = baseline.get("pipelines", {}).get(pipeline, {}).get("stages", {}).get(stage)
+            if not before:
+                continue
+            for key in ("p50", "p95"):
+                if before[key] > 0:
+                    change = now[key] / before[key] - 1
+                    if change > tolerance:
+                        regressions.append(f"{pipeline} {stage} {key}: {before[key]:.4f}s -> {now[key]:.4f}s ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipelines against a scripted Ollama stand-in")
+    sub = parser.add_subparsers(dest="command")
+    worker = sub.add_parser("worker", help=argparse.SUPPRESS)
+    worker.add_argument("--pipeline", choices=PIPELINES, required=True)
+    worker.add_argument("--questions", required=True)
+    worker.add_argument("--repeat", type=int, default=1)
+    worker.add_argument("--output", required=True)
+
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument("--questions", default=QUESTIONS, help="JSONL question set with scripted model steps")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per pipeline")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each process answers the question set")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub model seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Stub model generation speed")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Stub seconds per embedding request")
+    parser.add_argument("--port", type=int, default=11437)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per run")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        return run_worker(args)
+
+    questions = read_questions(args.questions)
+    host = start_stub(questions, args)
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "commit": subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip(),
+        "config": {
+            "questions": len(questions),
+            "runs": args.runs,
+            "repeat": args.repeat,
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "embed_latency": args.embed_latency,
+        },
+        "pipelines": {},
+    }
+
+    for pipeline in args.pipelines:
+        print(f"{pipeline}:")
+        runs = run_pipeline(pipeline, host, args)
+        stages = {stage: summarize(values) for stage, values in sorted(stage_samples(runs).items())}
+        errors = sum(1 for run in runs if "error" in run) + sum(
+            "error" in q for run in runs if "questions" in run for q in run["questions"]
+        )
+        results["pipelines"][pipeline] = {"stages": stages, "errors": errors, "runs": runs}
+        print(f"  {'stage':<28}{'n':>5}{'p50':>10}{'p95':>10}")
+        for stage, summary in stages.items():
+            print(f"  {stage:<28}{summary['n']:>5}{summary['p50']:>9.3f}s{summary['p95']:>9.3f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+    return 1 if any(result["errors"] for result in results["pipelines"].values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,21 @@
 from langchain_openai import ChatOpenAI
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langchain.agents.agent_toolkits import create_retriever_tool
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage
 from langgraph.prebuilt import create_react_agent
-from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
-from langchain_core.tools import tool
 from langchain.pydantic_v1 import BaseModel, Field
 from typing import Dict
-from tools import draw_bar_graph
+from tools import chart_status, draw_bar_graph
+import os
+import re
+
+from config import cache_dir
+from embeddings import EmbeddingCache, load_vector_db
 
 from database import db, query_as_list
-from utils import pretty_print
+from prompt import PromptAssembler, schema_summary, stable_tools
+from utils import stream_print
 
 # Initialize LLM
 llm = ChatOpenAI(model="gpt-3.5-turbo-0125")
@@ -23,7 +27,16 @@ tools = toolkit.get_tools()
 artists = query_as_list(db, "SELECT Name FROM Artist")
 albums = query_as_list(db, "SELECT Title FROM Album")
 
-vector_db = FAISS.from_texts(artists + albums, OpenAIEmbeddings())
+# EMBEDDINGS_BACKEND=ollama embeds the proper nouns with a local model instead of OpenAI
+if os.environ.get("EMBEDDINGS_BACKEND", "openai") == "ollama":
+    from langchain_ollama import OllamaEmbeddings
+
+    base_embeddings = OllamaEmbeddings(model=os.environ.get("OLLAMA_EMBED_MODEL", "llama3.1:latest"))
+else:
+    base_embeddings = OpenAIEmbeddings()
+embeddings = EmbeddingCache(base_embeddings, os.path.join(cache_dir(), "embeddings.sqlite"))
+index_dir = cache_dir("faiss", re.sub(r"[^\w.-]", "_", embeddings.model))
+vector_db = load_vector_db(artists + albums, embeddings, index_dir)
 retriever = vector_db.as_retriever(search_kwargs={"k": 5})
 description = """Use to look up values to filter on. Input is an approximate spelling of the proper noun, output is \
 valid proper nouns. Use the noun most similar to the search."""
@@ -61,21 +74,23 @@ You MUST double-check your query before executing it. If you get an error while
 
 DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database.
 
-You have access to the following tables: {table_names}
+You have access to the following tables and columns:
+{schema}
 
 If you need to filter on a proper noun, you must ALWAYS first look up the filter value using the "search_proper_nouns" tool!
 Do not try to guess at the proper name - use this function to find similar ones.""".format(
-    table_names=db.get_usable_table_names()
+    schema=schema_summary(db)
 )
 
-system_message = SystemMessage(content=system)
+# Same prefix in every request: fixed system prompt, tools in a fixed order, old tool results compacted
+prompt = PromptAssembler(system)
 
 tools.append(retriever_tool)
 tools.append(draw_bar_graph)
+tools.append(chart_status)
+tools = stable_tools(tools)
 
-agent = create_react_agent(llm, tools, messages_modifier=system_message)
+agent = create_react_agent(llm, tools, messages_modifier=prompt)
 
 def run_agent(user_question):
-    for s in agent.stream({"messages": [HumanMessage(content=user_question)]}):
-        pretty_print(s)
-        print("----")
+    return stream_print(agent, {"messages": [HumanMessage(content=user_question)]})
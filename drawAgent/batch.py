@@ -0,0 +1,92 @@
+import json
+import time
+import asyncio
+import argparse
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+
+def read_questions(path):
+    """Questions are JSONL records with a "question" (and optional "id"), or bare JSON strings"""
+    questions = []
+    with open(path) as f:
+        for number, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"question": record}
+            record.setdefault("id", number)
+            questions.append(record)
+    return questions
+
+async def answer_question(agent, record, semaphore):
+    async with semaphore:
+        result = {"id": record["id"], "question": record["question"], "answer": None, "tools": [], "steps": []}
+        pending = {}
+        start = last = time.perf_counter()
+        try:
+            async for step in agent.astream({"messages": [HumanMessage(content=record["question"])]}):
+                now = time.perf_counter()
+                for node, update in step.items():
+                    result["steps"].append({"node": node, "seconds": round(now - last, 4)})
+                    for message in update["messages"]:
+                        if isinstance(message, AIMessage):
+                            for call in message.tool_calls:
+                                pending[call["id"]] = {"tool": call["name"], "args": call["args"], "started": now}
+                            if message.content and not message.tool_calls:
+                                result["answer"] = message.content
+                        elif isinstance(message, ToolMessage):
+                            call = pending.pop(message.tool_call_id, {"tool": message.name, "args": None, "started": last})
+                            result["tools"].append({
+                                "tool": call["tool"],
+                                "args": call["args"],
+                                "output": message.content,
+                                "seconds": round(now - call.pop("started"), 4),
+                            })
+                last = now
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["seconds"] = round(time.perf_counter() - start, 4)
+        return result
+
+async def run_batch(agent, questions, output_path, concurrency=4):
+    """Answer all questions with one agent, at most `concurrency` at a time, writing results as they finish"""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(answer_question(agent, record, semaphore)) for record in questions]
+    failed = 0
+    with open(output_path, "w") as out:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            failed += "error" in result
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[{result['id']}] {result['seconds']:.2f}s {'error' if 'error' in result else 'ok'}")
+    return failed
+
+def main(build_agent):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with a single agent")
+    parser.add_argument("questions", help="Input JSONL, one question per line")
+    parser.add_argument("output", help="Output JSONL with answers, tool traces and timings")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions processed at the same time")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    start = time.perf_counter()
+    agent = build_agent()
+    print(f"Agent ready in {time.perf_counter() - start:.2f}s, answering {len(questions)} questions")
+
+    start = time.perf_counter()
+    failed = asyncio.run(run_batch(agent, questions, args.output, args.concurrency))
+    print(f"Answered {len(questions) - failed}/{len(questions)} questions in {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+
+def build_agent():
+    import config  # noqa: F401 - prompts for API keys before the agent module builds its clients
+    from agent import agent
+
+    return agent
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(build_agent))
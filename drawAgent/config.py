@@ -9,15 +9,12 @@ load_dotenv()
 if not os.environ.get("OPENAI_API_KEY"):
     os.environ["OPENAI_API_KEY"] = getpass.getpass(prompt="Enter OpenAI API Key: ")
 
-# Prompt user for LangChain API Key if not set
-if not os.environ.get("LANGCHAIN_API_KEY"):
-    os.environ["LANGCHAIN_API_KEY"] = getpass.getpass(
-        prompt="Enter LangChain API Key: "
-    )
-    os.environ["LANGCHAIN_TRACING_V2"] = "true"
+# LangSmith tracing is only turned on when a key is configured; nothing prompts for it
+if os.environ.get("LANGCHAIN_API_KEY"):
+    os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
 
-# Prompt user for LangChain Project if not set
-if not os.environ.get("LANGCHAIN_PROJECT"):
-    os.environ["LANGCHAIN_PROJECT"] = getpass.getpass(
-        prompt="Enter your Langchain Project: "
-    )
+
+def cache_dir(*parts):
+    path = os.path.join(os.environ.get("OLLAMAOPS_CACHE_DIR", ".cache"), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
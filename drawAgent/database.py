@@ -1,13 +1,32 @@
+import re
 from langchain_community.utilities import SQLDatabase
 
 # Load Database
 db = SQLDatabase.from_uri("sqlite:///Chinook.db")
 
-def query_as_list(db, query):
-    import ast
-    import re
+NUMBERS = re.compile(r"\b\d+\b")
+
+def iter_query_values(db, query, chunk_size=1000):
+    """Yield the distinct normalized values of a query, fetching rows from the cursor in chunks"""
+    seen = set()
+    connection = db._engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                for value in row:
+                    if not value:
+                        continue
+                    value = NUMBERS.sub("", str(value)).strip()
+                    if value and value not in seen:
+                        seen.add(value)
+                        yield value
+    finally:
+        connection.close()
 
-    res = db.run(query)
-    res = [el for sub in ast.literal_eval(res) for el in sub if el]
-    res = [re.sub(r"\b\d+\b", "", string).strip() for string in res]
-    return list(set(res))
+def query_as_list(db, query):
+    return list(iter_query_values(db, query))
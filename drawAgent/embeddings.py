@@ -0,0 +1,107 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from array import array
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+def text_id(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def model_name(embeddings):
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+class EmbeddingCache(Embeddings):
+    """Embeddings wrapper that keeps document vectors on disk, keyed by (model, text hash)"""
+
+    def __init__(self, embeddings, path, model=None):
+        self.embeddings = embeddings
+        self.model = model or model_name(embeddings)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash))"
+        )
+        self.conn.commit()
+
+    def _load(self, keys, chunk_size=500):
+        found = {}
+        keys = list(keys)
+        with self.lock:
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i:i + chunk_size]
+                rows = self.conn.execute(
+                    "SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({})".format(
+                        ",".join("?" * len(chunk))
+                    ),
+                    [self.model, *chunk],
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _store(self, vectors):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(self.model, key, array("f", vector).tobytes()) for key, vector in vectors.items()],
+            )
+            self.conn.commit()
+
+    def embed_documents(self, texts):
+        keys = [text_id(text) for text in texts]
+        found = self._load(set(keys))
+
+        # Only strings never embedded before with this model go to the backend
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing.keys(), vectors))
+            self._store(new)
+            found.update(new)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def load_vector_db(texts, embeddings, index_dir):
+    """Load the FAISS index persisted in index_dir, rebuilding it when the texts or model changed"""
+    from langchain_community.vectorstores import FAISS
+
+    unique = {}
+    for text in texts:
+        unique.setdefault(text_id(text), text)
+    ids = list(unique.keys())
+
+    fingerprint = hashlib.sha256(
+        "\n".join([model_name(embeddings)] + sorted(ids)).encode("utf-8")
+    ).hexdigest()
+    manifest_path = os.path.join(index_dir, "manifest.json")
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("fingerprint") == fingerprint:
+            # The index files are written by save_local below, never taken from elsewhere
+            return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+
+    vector_db = FAISS.from_texts(list(unique.values()), embeddings, ids=ids)
+    os.makedirs(index_dir, exist_ok=True)
+    vector_db.save_local(index_dir)
+    with open(manifest_path, "w") as f:
+        json.dump({"fingerprint": fingerprint, "model": model_name(embeddings), "count": len(ids)}, f)
+    return vector_db
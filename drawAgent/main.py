@@ -1,8 +1,10 @@
-from config import *
-from agent import run_agent
+if __name__ == "__main__":
+    # Chart workers re-import the main module when they start, so nothing runs on import
+    from config import *
+    from agent import run_agent
 
-# Prompt user for a question
-user_question = input("Please enter your question: ")
+    # Prompt user for a question
+    user_question = input("Please enter your question: ")
 
-# Run the agent with the user's question
-run_agent(user_question)
+    # Run the agent with the user's question
+    run_agent(user_question)
@@ -0,0 +1,54 @@
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+
+# Rough size of a llama3 token in characters, for budgets and estimates only
+CHARS_PER_TOKEN = 4
+
+def schema_summary(db):
+    """One sorted "Table(column, ...)" line per table, identical across processes for the same schema"""
+    catalog = getattr(db, "catalog", None)
+    if catalog is not None:
+        tables = {name: catalog.columns(name) for name in catalog.table_names()}
+    else:
+        tables = {
+            name: [column["name"] for column in db._inspector.get_columns(name)]
+            for name in db.get_usable_table_names()
+        }
+    return "\n".join(f"{name}({', '.join(columns)})" for name, columns in sorted(tables.items()))
+
+def stable_tools(tools):
+    """Tools in name order, so the bound tool schemas serialize the same way every run"""
+    return sorted(tools, key=lambda tool: tool.name)
+
+def compact(message, max_tokens):
+    """Cut an old tool result down to max_tokens, keeping its start"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    content = str(message.content)
+    if len(content) <= limit:
+        return message
+    content = content[:limit] + f"\n[... {len(content) - limit} characters of this earlier result omitted]"
+    return message.copy(update={"content": content})
+
+
+class PromptAssembler:
+    """Builds each model request as a fixed prefix followed by the conversation.
+
+    The system message is created once and is byte-identical for every call and every
+    process with the same schema, so Ollama can reuse the evaluated prefix. Tool results of
+    earlier turns are cut to old_tool_tokens; the cut only depends on the message itself, so
+    a compacted message reads the same in every later request and the prefix keeps matching.
+    """
+
+    def __init__(self, system, old_tool_tokens=200):
+        self.system_message = SystemMessage(content=system)
+        self.old_tool_tokens = old_tool_tokens
+
+    def __call__(self, messages):
+        # The run answering the latest question keeps its results whole: it may still need
+        # every page of a query or the schema it is rewriting a statement against
+        last_turn = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=0)
+        history = [
+            compact(message, self.old_tool_tokens) if isinstance(message, ToolMessage) and i < last_turn else message
+            for i, message in enumerate(messages)
+        ]
+        return [self.system_message] + history
+
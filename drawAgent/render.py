@@ -0,0 +1,202 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Figure, axes and canvas per chart kind, created once per worker process and reused
+_templates = {}
+
+def chart_template(kind):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    if kind not in _templates:
+        fig = Figure(figsize=(10, 10) if kind == "pie" else (15, 10))
+        canvas = FigureCanvasAgg(fig)
+        _templates[kind] = (fig, fig.add_subplot(), canvas)
+    return _templates[kind]
+
+def render_chart(kind, args, path):
+    """Render one chart to path with the object-oriented Agg API; runs inside a worker process"""
+    if kind not in ("bar", "line", "pie"):
+        raise ValueError(f"Unknown chart kind: {kind}")
+    _, ax, canvas = chart_template(kind)
+    ax.clear()
+
+    labels = list(args["data"].keys())
+    values = list(args["data"].values())
+
+    if kind == "pie":
+        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=140)
+    else:
+        if kind == "bar":
+            ax.barh(labels, values, color="skyblue")
+            ax.grid(axis="x", linestyle="--", alpha=0.7)
+        else:
+            ax.plot(labels, values, marker='o', color="skyblue")
+            ax.grid(axis="both", linestyle="--", alpha=0.7)
+        ax.set_xlabel(args["xlabel"])
+        ax.set_ylabel(args["ylabel"])
+    ax.set_title(args["title"])
+
+    # Write under a temporary name so a finished path is never half written; the name is
+    # unique because identical requests rendering at the same time share the final path
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.tmp.{os.getpid()}.{uuid.uuid4().hex}{ext}"
+    canvas.print_figure(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+class QueueFull(Exception):
+    pass
+
+
+def artifact_id(kind, args, format):
+    """Content hash of everything that affects the rendered file"""
+    # The order of the data points is the order of the bars, so only the top level is sorted
+    args = dict(args, data=list(args["data"].items())) if isinstance(args.get("data"), dict) else args
+    key = json.dumps({"kind": kind, "args": args, "format": format}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class RenderService:
+    """Renders charts in a pool of worker processes, off the agent's tool step.
+
+    Artifacts are content addressed: identical arguments map to the same file, which is
+    returned without rendering again. The output directory is kept under max_bytes by
+    deleting the least recently used artifacts. Workers are spawned rather than forked, so
+    they start from a clean interpreter that only imports this module.
+    """
+
+    def __init__(
+        self, output_dir=None, max_workers=2, max_pending=16, max_jobs=1000, max_bytes=256 * 1024 * 1024,
+        start_method="spawn",
+    ):
+        self.output_dir = output_dir or os.environ.get("CHARTS_DIR", "charts")
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.jobs = OrderedDict()
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _done(self, future):
+        with self.lock:
+            self.pending -= 1
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used artifacts until the directory fits in max_bytes"""
+        entries = []
+        with os.scandir(self.output_dir) as it:
+            for entry in it:
+                if entry.is_file() and ".tmp." not in entry.name:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = set()
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            removed.add(path)
+            total -= size
+        if removed:
+            # Evicted charts are no longer "done"; a later submit renders them again
+            with self.lock:
+                for chart_id in [
+                    chart_id
+                    for chart_id, job in self.jobs.items()
+                    if job["path"] in removed and (job["future"] is None or job["future"].done())
+                ]:
+                    del self.jobs[chart_id]
+
+    def submit(self, kind, args, format="png"):
+        """Queue a chart, or find it already rendered, and return its artifact id straight away"""
+        chart_id = artifact_id(kind, args, format)
+        path = os.path.join(self.output_dir, f"{kind}_{chart_id}.{format}")
+        with self.lock:
+            job = self.jobs.get(chart_id)
+            if job is not None and (job["future"] is None or not job["future"].done()):
+                # Same chart already rendered or in flight
+                self.hits += 1
+                self.jobs.move_to_end(chart_id)
+                if job["future"] is None:
+                    self._touch(path)
+                return chart_id, path
+            if os.path.exists(path) and self._touch(path):
+                self.hits += 1
+                self.jobs[chart_id] = {"kind": kind, "path": path, "future": None}
+                self.jobs.move_to_end(chart_id)
+                return chart_id, path
+
+            if self.pending >= self.max_pending:
+                raise QueueFull(f"{self.pending} charts are already waiting to be rendered")
+            if self.executor is None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context(self.start_method)
+                )
+            self.misses += 1
+            future = self.executor.submit(render_chart, kind, args, path)
+            self.pending += 1
+            self.jobs[chart_id] = {"kind": kind, "path": path, "future": future}
+            self.jobs.move_to_end(chart_id)
+            # Forget the oldest finished jobs; their files stay on disk
+            while len(self.jobs) > self.max_jobs:
+                oldest = next(iter(self.jobs))
+                if self.jobs[oldest]["future"] is not None and not self.jobs[oldest]["future"].done():
+                    break
+                del self.jobs[oldest]
+        future.add_done_callback(self._done)
+        return chart_id, path
+
+    def _touch(self, path):
+        # The mtime doubles as the last-used time for eviction
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def status(self, artifact_id):
+        job = self.jobs.get(artifact_id)
+        if job is None:
+            return {"id": artifact_id, "status": "unknown"}
+        future = job["future"]
+        if future is None:
+            if not os.path.exists(job["path"]):
+                return {"id": artifact_id, "status": "evicted"}
+            return {"id": artifact_id, "status": "done", "path": job["path"]}
+        if not future.done():
+            return {"id": artifact_id, "status": "rendering", "path": job["path"]}
+        if future.exception() is not None:
+            return {"id": artifact_id, "status": "failed", "error": str(future.exception())}
+        if not os.path.exists(job["path"]):
+            return {"id": artifact_id, "status": "evicted"}
+        return {"id": artifact_id, "status": "done", "path": job["path"]}
+
+    def wait(self, artifact_id, timeout=None):
+        job = self.jobs.get(artifact_id)
+        if job is not None and job["future"] is not None:
+            job["future"].exception(timeout=timeout)
+        return self.status(artifact_id)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
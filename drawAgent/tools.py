@@ -1,51 +1,42 @@
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 from langchain_core.tools import tool
 from typing import Dict
+from render import QueueFull, RenderService
+
+# Charts are rendered by worker processes; the tools only queue them and hand back an id
+renderer = RenderService()
+
+def queue_chart(kind, **args):
+    try:
+        artifact_id, path = renderer.submit(kind, args)
+    except QueueFull as e:
+        return f"The chart could not be queued: {e}. Try again later."
+    if renderer.status(artifact_id)["status"] == "done":
+        return f"Graph has been saved as {path}"
+    return f"Chart {artifact_id} is being rendered to {path}. Use chart_status with id {artifact_id} to check on it."
 
 @tool
 def draw_line_graph(data: Dict[str, float], title: str, xlabel: str, ylabel: str) -> str:
     """Draw a Line Graph"""
-    countries = list(data.keys())
-    values = list(data.values())
-
-    plt.figure(figsize=(15, 10))
-    plt.plot(countries, values, marker='o', color="skyblue")
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.title(title)
-    plt.grid(axis="both", linestyle="--", alpha=0.7)
-    plt.savefig("line_graph.png")
-    plt.close()  # Close the plot to avoid memory issues
-    return "Graph has been saved as line_graph.png"
+    return queue_chart("line", data=data, title=title, xlabel=xlabel, ylabel=ylabel)
 
 @tool
 def draw_pie_chart(data: Dict[str, float], title: str) -> str:
     """Draw a Pie Chart"""
-    countries = list(data.keys())
-    values = list(data.values())
-
-    plt.figure(figsize=(10, 10))
-    plt.pie(values, labels=countries, autopct='%1.1f%%', startangle=140)
-    plt.title(title)
-    plt.savefig("pie_chart.png")
-    plt.close()  # Close the plot to avoid memory issues
-    return "Graph has been saved as pie_chart.png"
-from typing import Dict
+    return queue_chart("pie", data=data, title=title)
 
 @tool
 def draw_bar_graph(data: Dict[str, float], title: str, xlabel: str, ylabel: str) -> str:
     """Draw a Bar Graph"""
-    countries = list(data.keys())
-    values = list(data.values())
+    return queue_chart("bar", data=data, title=title, xlabel=xlabel, ylabel=ylabel)
 
-    plt.figure(figsize=(15, 10))
-    plt.barh(countries, values, color="skyblue")
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.title(title)
-    plt.grid(axis="x", linestyle="--", alpha=0.7)
-    plt.savefig("bar_graph.png")
-    plt.close()  # Close the plot to avoid memory issues
-    return "Graph has been saved as bar_graph.png"
+@tool
+def chart_status(artifact_id: str) -> str:
+    """Check whether a chart queued by one of the draw tools has finished rendering"""
+    status = renderer.status(artifact_id)
+    if status["status"] == "done":
+        return f"Chart {artifact_id} has been saved as {status['path']}"
+    if status["status"] == "rendering":
+        return f"Chart {artifact_id} is still rendering to {status['path']}"
+    if status["status"] == "failed":
+        return f"Chart {artifact_id} failed to render: {status['error']}"
+    return f"There is no chart with id {artifact_id}"
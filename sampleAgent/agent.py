@@ -1,8 +1,10 @@
-from langchain_core.messages import SystemMessage
-from langgraph.prebuilt import create_react_agent
+import uuid
+from langchain_core.messages import AIMessage, ToolMessage
 from graph import draw_bar_graph
+from plan_cache import QUERY_TOOL, last_question, successful_sql
+from prompt import PromptAssembler, schema_summary, stable_tools
 
-def create_agent(llm, tools, db):
+def create_agent(llm, tools, db, plan_cache=None, aggregates=None):
     system = """You are an agent designed to interact with a SQL database.
     Given an input question, create a syntactically correct SQLite query to run, then look at the results of the query and return the answer.
     Unless the user specifies a specific number of examples they wish to obtain, always limit your query to at most 5 results.
@@ -22,10 +24,76 @@ def create_agent(llm, tools, db):
 
     DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database.
 
-    You have access to the following tables: {table_names}
-    """.format(table_names=db.get_usable_table_names())
+    You have access to the following tables and columns:
+    {schema}
+    """.format(schema=schema_summary(db))
+    if aggregates is not None:
+        system += "\n    " + aggregates.describe() + "\n"
 
-    system_message = SystemMessage(content=system)
+    # The system prompt and tool schemas form the same prefix in every request, and old tool
+    # results are compacted, so Ollama can reuse its evaluated prompt across turns and runs
+    prompt = PromptAssembler(system)
     tools.append(draw_bar_graph)
+    tools = stable_tools(tools)
 
-    return create_react_agent(llm, tools, messages_modifier=system_message)
+    if plan_cache is not None:
+        return create_cached_agent(llm, tools, db, prompt, plan_cache)
+
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(llm, tools, messages_modifier=prompt)
+
+def create_cached_agent(llm, tools, db, prompt, plan_cache):
+    """ReAct agent behind a plan cache lookup.
+
+    A question whose SQL is cached runs that SQL directly and makes a single LLM call to phrase
+    the answer; any other question goes through the usual agent/tools loop, and its SQL is
+    recorded once the agent answers if that one statement is all the answer rests on.
+    """
+    from langgraph.graph import StateGraph, MessagesState, START, END
+    from langgraph.prebuilt import ToolNode, tools_condition
+
+    model = llm.bind_tools(tools)
+
+    def plan(state):
+        question = last_question(state["messages"])
+        sql = plan_cache.lookup(question) if question else None
+        if sql is None:
+            return {"messages": []}
+        result = db.run_no_throw(sql)
+        if str(result).startswith("Error"):
+            plan_cache.forget(sql)
+            return {"messages": []}
+        # Shown to the model and to stream consumers exactly like an sql_db_query call
+        call_id = f"plan_{uuid.uuid4().hex}"
+        call = AIMessage(content="", tool_calls=[{"name": QUERY_TOOL, "args": {"query": sql}, "id": call_id}])
+        return {"messages": [call, ToolMessage(content=str(result), name=QUERY_TOOL, tool_call_id=call_id)]}
+
+    def answer(state, config):
+        return {"messages": [llm.invoke(prompt(state["messages"]), config)]}
+
+    def agent(state, config):
+        return {"messages": [model.invoke(prompt(state["messages"]), config)]}
+
+    def record(state):
+        question = last_question(state["messages"])
+        sql = successful_sql(state["messages"])
+        if question and sql:
+            plan_cache.record(question, sql)
+        return {"messages": []}
+
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("plan", plan)
+    workflow.add_node("answer", answer)
+    workflow.add_node("agent", agent)
+    workflow.add_node("tools", ToolNode(tools))
+    workflow.add_node("record", record)
+    workflow.add_edge(START, "plan")
+    workflow.add_conditional_edges(
+        "plan", lambda state: "answer" if isinstance(state["messages"][-1], ToolMessage) else "agent"
+    )
+    workflow.add_conditional_edges("agent", tools_condition, {"tools": "tools", END: "record"})
+    workflow.add_edge("tools", "agent")
+    workflow.add_edge("answer", END)
+    workflow.add_edge("record", END)
+    return workflow.compile()
@@ -0,0 +1,226 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Any, Literal, Optional, Type
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.tools import BaseTool
+
+# Dimension -> (source table whose rows are counted, totals of the source rows past the
+# watermark). Invoice totals add up per invoice and line totals per line, so each refresh
+# only reads the rows it has not seen yet.
+AGGREGATES = {
+    "country": (
+        "Invoice",
+        """SELECT BillingCountry, count(*), total(Total) FROM src.Invoice
+        WHERE InvoiceId > :watermark GROUP BY BillingCountry""",
+    ),
+    "month": (
+        "Invoice",
+        """SELECT strftime('%Y-%m', InvoiceDate), count(*), total(Total) FROM src.Invoice
+        WHERE InvoiceId > :watermark GROUP BY 1""",
+    ),
+    "genre": (
+        "InvoiceLine",
+        """SELECT g.Name, total(il.Quantity), total(il.UnitPrice * il.Quantity) FROM src.InvoiceLine il
+        JOIN src.Track t ON t.TrackId = il.TrackId JOIN src.Genre g ON g.GenreId = t.GenreId
+        WHERE il.InvoiceLineId > :watermark GROUP BY g.Name""",
+    ),
+    "artist": (
+        "InvoiceLine",
+        """SELECT ar.Name, total(il.Quantity), total(il.UnitPrice * il.Quantity) FROM src.InvoiceLine il
+        JOIN src.Track t ON t.TrackId = il.TrackId JOIN src.Album al ON al.AlbumId = t.AlbumId
+        JOIN src.Artist ar ON ar.ArtistId = al.ArtistId
+        WHERE il.InvoiceLineId > :watermark GROUP BY ar.Name""",
+    ),
+}
+
+# Name of the count column for each source table
+COUNTS = {"Invoice": "invoices", "InvoiceLine": "tracks_sold"}
+
+# Checksum over the columns the aggregates read, compared for the rows at or below the
+# watermark to notice in-place updates (prices, quantities, dates, tracks) between rebuilds.
+# Every term is a whole number (cents, days) so the sums are exact and add up incrementally.
+CHECKSUMS = {
+    "Invoice": "total(round(Total * 100)) + total(CAST(julianday(InvoiceDate) AS INTEGER))",
+    "InvoiceLine": "total(round(UnitPrice * Quantity * 100)) + total(Quantity) + total(TrackId)",
+}
+
+# Dimension columns the genre and artist totals join through. These tables are small, so
+# each refresh fingerprints them whole and a reassigned track or renamed artist rebuilds.
+DIMENSIONS = {
+    "Track": "TrackId, AlbumId, GenreId",
+    "Album": "AlbumId, ArtistId",
+    "Artist": "ArtistId, Name",
+    "Genre": "GenreId, Name",
+}
+
+
+class SalesAggregates:
+    """Sales totals by country, month, genre and artist, materialized in a sidecar database.
+
+    The sidecar attaches the source database read-only and keeps one small table per
+    aggregate, keyed by its dimension. Like IndexRefresher, a refresh only reads Invoice and
+    InvoiceLine rows past the rowid watermark. Deletes show up as a row count mismatch and
+    in-place updates as a checksum mismatch below the watermark, and changed tracks, albums,
+    artists or genres as a new fingerprint of those tables; any of them rebuilds the
+    aggregates. A periodic full rebuild catches anything else (e.g. a renamed country).
+    """
+
+    def __init__(self, path, source, reconcile_every=50):
+        self.reconcile_every = reconcile_every
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, uri=True, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("ATTACH DATABASE ? AS src", (f"file:{source}?mode=ro",))
+        for name, (table, _) in AGGREGATES.items():
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS sales_by_{name} "
+                f"({name} TEXT PRIMARY KEY, {COUNTS[table]} INTEGER NOT NULL, revenue REAL NOT NULL)"
+            )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks "
+            "(source TEXT PRIMARY KEY, rowid INTEGER NOT NULL, row_count INTEGER NOT NULL, checksum REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS fingerprints (name TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+        self.data_version = None
+        self.changes = 0
+
+    def _watermarks(self):
+        stored = {source: tuple(row) for source, *row in self.conn.execute("SELECT * FROM watermarks")}
+        return {table: stored.get(table, (0, 0, 0.0)) for table in COUNTS}
+
+    def _scan(self, table, condition, rowid):
+        return self.conn.execute(
+            f"SELECT count(*), {CHECKSUMS[table]} FROM src.{table} WHERE rowid {condition} ?", (rowid,)
+        ).fetchone()
+
+    def _fingerprint(self):
+        digest = hashlib.sha256()
+        for table, columns in DIMENSIONS.items():
+            for row in self.conn.execute(f"SELECT {columns} FROM src.{table} ORDER BY rowid"):
+                digest.update(repr(row).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _rebuild_needed(self, watermarks, fingerprint):
+        if self.changes and self.changes % self.reconcile_every == 0:
+            return True
+        stored = self.conn.execute("SELECT digest FROM fingerprints WHERE name = 'dimensions'").fetchone()
+        if stored is None or stored[0] != fingerprint:
+            return True
+        for table, (rowid, count, checksum) in watermarks.items():
+            # Rows at or below the watermark only change in number when some were deleted
+            seen, total = self._scan(table, "<=", rowid)
+            if seen != count or total != checksum:
+                return True
+        return False
+
+    def refresh(self):
+        """Fold new invoices into the aggregates; returns the number of new source rows"""
+        with self.lock:
+            version = self.conn.execute("PRAGMA src.data_version").fetchone()[0]
+            if version == self.data_version:
+                return 0
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                watermarks = self._watermarks()
+                fingerprint = self._fingerprint()
+                if self._rebuild_needed(watermarks, fingerprint):
+                    for name in AGGREGATES:
+                        self.conn.execute(f"DELETE FROM sales_by_{name}")
+                    watermarks = {table: (0, 0, 0.0) for table in COUNTS}
+                for name, (table, select) in AGGREGATES.items():
+                    counted = COUNTS[table]
+                    self.conn.execute(
+                        f"INSERT INTO sales_by_{name} SELECT * FROM ({select}) WHERE true "
+                        f"ON CONFLICT({name}) DO UPDATE SET {counted} = {counted} + excluded.{counted}, "
+                        "revenue = revenue + excluded.revenue",
+                        {"watermark": watermarks[table][0]},
+                    )
+                added = 0
+                for table, (rowid, count, checksum) in watermarks.items():
+                    new_rowid, new_rows, new_checksum = self.conn.execute(
+                        f"SELECT coalesce(max(rowid), ?), count(*), {CHECKSUMS[table]} FROM src.{table} WHERE rowid > ?",
+                        (rowid, rowid),
+                    ).fetchone()
+                    added += new_rows
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                        (table, new_rowid, count + new_rows, checksum + new_checksum),
+                    )
+                self.conn.execute("INSERT OR REPLACE INTO fingerprints VALUES ('dimensions', ?)", (fingerprint,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.data_version = version
+            self.changes += 1
+            return added
+
+    def query(self, by, value=None, order="revenue", limit=10):
+        """Rows of one aggregate, optionally only the one whose key equals value"""
+        table, _ = AGGREGATES[by]
+        columns = [by, COUNTS[table], "revenue"]
+        sql = f"SELECT {', '.join(columns)} FROM sales_by_{by}"
+        parameters = []
+        if value:
+            sql += f" WHERE {by} = ? COLLATE NOCASE"
+            parameters.append(value)
+        sql += f" ORDER BY {by}" if order == by else f" ORDER BY {order} DESC"
+        sql += " LIMIT ?"
+        parameters.append(limit)
+        self.refresh()
+        with self.lock:
+            return columns, self.conn.execute(sql, parameters).fetchall()
+
+    def describe(self):
+        """Sentence for the system prompt naming the tool and what it covers"""
+        return (
+            "Precomputed sales totals are available from the sales_summary tool: invoices and revenue by "
+            "country or month (YYYY-MM), and tracks sold and revenue by genre or artist. They are "
+            "refreshed from the database before every lookup; use sales_summary instead of a SQL query whenever it "
+            "can answer the question."
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _SalesSummaryInput(BaseModel):
+    by: Literal["country", "month", "genre", "artist"] = Field(..., description="Dimension to total sales by.")
+    value: Optional[str] = Field(None, description="Only return the total of this country, month, genre or artist.")
+    order: Literal["revenue", "count", "key"] = Field(
+        "revenue", description='Sort by revenue or count (highest first), or by "key" (alphabetical or chronological).'
+    )
+    limit: int = Field(10, description="Maximum number of rows to return.")
+
+
+class SalesSummaryTool(BaseTool):
+    """Reads the materialized sales aggregates instead of joining the invoice tables"""
+
+    aggregates: Any = Field(exclude=True)
+    name: str = "sales_summary"
+    description: str = (
+        "Get precomputed sales totals (invoices or tracks sold, and revenue) by country, month, genre or artist. "
+        "Much faster than a SQL query for these totals."
+    )
+    args_schema: Type[BaseModel] = _SalesSummaryInput
+
+    def _run(
+        self,
+        by: str,
+        value: Optional[str] = None,
+        order: str = "revenue",
+        limit: int = 10,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> str:
+        counted = COUNTS[AGGREGATES[by][0]]
+        columns, rows = self.aggregates.query(
+            by, value, order={"key": by, "count": counted}.get(order, "revenue"), limit=max(1, min(limit, 100))
+        )
+        if not rows:
+            return f"No sales found for {by} {value!r}." if value else "No sales recorded yet."
+        lines = [" | ".join(columns)]
+        lines += [f"{key} | {count:g} | {revenue:.2f}" for key, count, revenue in rows]
+        return "\n".join(lines)
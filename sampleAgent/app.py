@@ -0,0 +1,64 @@
+import os
+from langchain_core.runnables import RunnableBinding
+from config import cache_dir, load_env_variables
+from database import db, query_as_list, shards
+from embeddings import EmbeddingCache
+from llm import initialize_embeddings, initialize_llm, initialize_models, initialize_tools
+from agent import create_agent
+from plan_cache import PlanCache
+from tracing import tracer
+
+# Model lifecycle manager started by build_agent, for load state and load time metrics
+models = None
+
+def initialize_plan_cache(db):
+    # PLAN_CACHE=0 turns the fast path off; PLAN_CACHE_SIMILARITY=0.95 also matches
+    # rephrased questions whose embeddings are at least that similar
+    if os.environ.get("PLAN_CACHE", "1") == "0":
+        return None
+    embeddings = None
+    threshold = os.environ.get("PLAN_CACHE_SIMILARITY")
+    if threshold:
+        embeddings = EmbeddingCache(initialize_embeddings(), os.path.join(cache_dir(), "embeddings.sqlite"))
+    return PlanCache(
+        os.path.join(cache_dir(), "plans.sqlite"), db, embeddings=embeddings, threshold=float(threshold or 0.95)
+    )
+
+def initialize_aggregates(db):
+    # Sales totals kept in a sidecar database next to the other caches; AGGREGATES=0 turns them off
+    if os.environ.get("AGGREGATES", "1") == "0":
+        return None
+    from aggregates import SalesAggregates
+
+    aggregates = SalesAggregates(os.path.join(cache_dir(), "aggregates.sqlite"), db._engine.url.database)
+    aggregates.refresh()
+    return aggregates
+
+def build_agent(interactive=True):
+    """Load the environment and build the LLM, tools, proper-noun index and agent once"""
+    global models
+    load_env_variables(interactive)
+    # Loads the Ollama models while the proper-noun index is being built
+    if models is None:
+        models = initialize_models()
+
+    # Initialize Database
+    databases = list(shards.databases.values()) if shards is not None else [db]
+    artists = list(dict.fromkeys(value for d in databases for value in query_as_list(d, "SELECT Name FROM Artist")))
+    albums = list(dict.fromkeys(value for d in databases for value in query_as_list(d, "SELECT Title FROM Album")))
+
+    # Initialize LLM and Tools
+    llm = initialize_llm()
+    # Cached plans and the sales aggregates only cover a single database, so they are off
+    # when queries fan out
+    aggregates = initialize_aggregates(db) if shards is None else None
+    tools = initialize_tools(llm, db, artists, albums, shards=shards, aggregates=aggregates)
+
+    plan_cache = initialize_plan_cache(db) if shards is None else None
+    agent = create_agent(llm, tools, db, plan_cache=plan_cache, aggregates=aggregates)
+    # Every question is traced locally (spans under .cache/traces, metrics for /metrics);
+    # TRACING=0 turns it off
+    if os.environ.get("TRACING", "1") == "0":
+        return agent
+    # A graph's own with_config() is replaced by callbacks passed at call time; a binding adds to them
+    return RunnableBinding(bound=agent, config={"callbacks": [tracer]})
@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+from langchain_community.utilities import SQLDatabase
+
+
+class SchemaCatalog:
+    """Table DDL, sample rows, row counts and foreign keys of a database, captured once.
+
+    The catalog is keyed by PRAGMA schema_version, so sample rows and row counts are a
+    snapshot from when the schema last changed rather than live values.
+    """
+
+    def __init__(self, version, tables):
+        self.version = version
+        self.tables = tables
+
+    def table_names(self):
+        return sorted(self.tables)
+
+    def table_info(self, table_names=None):
+        names = self.table_names() if table_names is None else table_names
+        return "\n\n".join(sorted(self.tables[name]["info"] for name in names))
+
+    def columns(self, table):
+        return self.tables[table]["columns"]
+
+    def row_count(self, table):
+        return self.tables[table]["row_count"]
+
+    def foreign_keys(self, table):
+        return self.tables[table]["foreign_keys"]
+
+    def related(self, table):
+        """Tables joined to this one by a foreign key in either direction"""
+        related = {fk["table"] for fk in self.foreign_keys(table)}
+        related.update(
+            name for name, info in self.tables.items()
+            if any(fk["table"] == table for fk in info["foreign_keys"])
+        )
+        related.discard(table)
+        return sorted(related)
+
+    def to_dict(self):
+        return {"version": self.version, "tables": self.tables}
+
+    @classmethod
+    def build(cls, db, version):
+        tables = {}
+        connection = db._engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for name in db.get_usable_table_names():
+                columns = [row[1] for row in cursor.execute(f'PRAGMA table_info("{name}")')]
+                foreign_keys = [
+                    {"column": row[3], "table": row[2], "to": row[4]}
+                    for row in cursor.execute(f'PRAGMA foreign_key_list("{name}")')
+                ]
+                row_count = cursor.execute(f'SELECT count(*) FROM "{name}"').fetchone()[0]
+                tables[name] = {
+                    # The base implementation renders the same DDL and sample rows the toolkit shows
+                    "info": SQLDatabase.get_table_info(db, [name]),
+                    "columns": columns,
+                    "row_count": row_count,
+                    "foreign_keys": foreign_keys,
+                }
+        finally:
+            connection.close()
+        return cls(version, tables)
+
+
+def load_catalog(db, directory, version):
+    """Load the catalog for this database and schema version from disk, building it on a miss"""
+    key = hashlib.sha256(
+        json.dumps([os.path.abspath(db._engine.url.database), db.get_usable_table_names()]).encode("utf-8")
+    ).hexdigest()[:16]
+    path = os.path.join(directory, f"{key}-{version}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        return SchemaCatalog(data["version"], data["tables"])
+
+    catalog = SchemaCatalog.build(db, version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(catalog.to_dict(), f)
+    os.replace(tmp_path, path)
+    return catalog
@@ -2,15 +2,21 @@ import os
 import getpass
 from dotenv import load_dotenv
 
-def load_env_variables():
+def load_env_variables(interactive=True):
+    """Load .env; without interactive a missing key raises instead of waiting for a prompt"""
     load_dotenv()
 
-    if not os.environ.get("OPENAI_API_KEY"):
+    # The OpenAI key is only needed for OpenAI embeddings
+    if os.environ.get("EMBEDDINGS_BACKEND", "openai") == "openai" and not os.environ.get("OPENAI_API_KEY"):
+        if not interactive:
+            raise RuntimeError("OPENAI_API_KEY is not set; set it or use EMBEDDINGS_BACKEND=ollama")
         os.environ["OPENAI_API_KEY"] = getpass.getpass(prompt="Enter OpenAI API Key: ")
 
-    if not os.environ.get("LANGCHAIN_API_KEY"):
-        os.environ["LANGCHAIN_API_KEY"] = getpass.getpass(prompt="Enter LangChain API Key: ")
-        os.environ["LANGCHAIN_TRACING_V2"] = "true"
+    # Runs are traced locally by tracing.py; LangSmith is only used when a key is configured
+    if os.environ.get("LANGCHAIN_API_KEY"):
+        os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
 
-    if not os.environ.get("LANGCHAIN_PROJECT"):
-        os.environ["LANGCHAIN_PROJECT"] = getpass.getpass(prompt="Enter your LangChain Project: ")
+def cache_dir(*parts):
+    path = os.path.join(os.environ.get("OLLAMAOPS_CACHE_DIR", ".cache"), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -1,12 +1,45 @@
+import os
 import re
-import ast
-from langchain_community.utilities import SQLDatabase
+from config import cache_dir
+from pool import readonly_database
+
+# SQLITE_DATABASES="north=north.db,south=south.db" registers one database per tenant or region,
+# all with the Chinook schema; sql_db_query then runs on every one of them at once
+shards = None
+if os.environ.get("SQLITE_DATABASES"):
+    from fanout import ShardSet
+
+    shards = ShardSet.from_env(os.environ["SQLITE_DATABASES"], catalog_dir=cache_dir("catalog"))
 
 # Load Database
-db = SQLDatabase.from_uri("sqlite:///Chinook.db")
+db = shards.primary if shards is not None else readonly_database("Chinook.db", catalog_dir=cache_dir("catalog"))
+
+NUMBERS = re.compile(r"\b\d+\b")
+
+def normalize_value(value):
+    return NUMBERS.sub("", str(value)).strip()
+
+def iter_query_values(db, query, chunk_size=1000):
+    """Yield the distinct normalized values of a query, fetching rows from the cursor in chunks"""
+    seen = set()
+    connection = db._engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                for value in row:
+                    if not value:
+                        continue
+                    value = normalize_value(value)
+                    if value and value not in seen:
+                        seen.add(value)
+                        yield value
+    finally:
+        connection.close()
 
 def query_as_list(db, query):
-    res = db.run(query)
-    res = [el for sub in ast.literal_eval(res) for el in sub if el]
-    res = [re.sub(r"\b\d+\b", "", string).strip() for string in res]
-    return list(set(res))
+    return list(iter_query_values(db, query))
@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+def text_id(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def model_name(embeddings):
+    return getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+class EmbeddingCache(Embeddings):
+    """Embeddings wrapper that keeps document vectors on disk, keyed by (model, text hash)"""
+
+    def __init__(self, embeddings, path, model=None):
+        self.embeddings = embeddings
+        self.model = model or model_name(embeddings)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash))"
+        )
+        self.conn.commit()
+
+    def _load(self, keys, chunk_size=500):
+        found = {}
+        keys = list(keys)
+        with self.lock:
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i:i + chunk_size]
+                rows = self.conn.execute(
+                    "SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({})".format(
+                        ",".join("?" * len(chunk))
+                    ),
+                    [self.model, *chunk],
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _store(self, vectors):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(self.model, key, array("f", vector).tobytes()) for key, vector in vectors.items()],
+            )
+            self.conn.commit()
+
+    def embed_documents(self, texts):
+        keys = [text_id(text) for text in texts]
+        found = self._load(set(keys))
+
+        # Only strings never embedded before with this model go to the backend
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing.keys(), vectors))
+            self._store(new)
+            found.update(new)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+class OllamaEmbedder(Embeddings):
+    """Ollama /api/embed client that sends whole batches over a pooled HTTP session"""
+
+    def __init__(self, model, base_url=None, pool_size=4, keep_alive=None, timeout=120):
+        self.model = model
+        self.base_url = (base_url or os.environ.get("OLLAMA_HOST") or "http://localhost:11434").rstrip("/")
+        if "://" not in self.base_url:
+            self.base_url = "http://" + self.base_url
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def embed_documents(self, texts):
+        payload = {"model": self.model, "input": texts}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        response = self.session.post(f"{self.base_url}/api/embed", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class BatchEmbeddings(Embeddings):
+    """Splits documents into batches and embeds them concurrently, with retries and throughput stats"""
+
+    def __init__(self, embeddings, batch_size=64, max_concurrency=4, max_retries=3, backoff=0.5, progress=None):
+        self.embeddings = embeddings
+        self.model = model_name(embeddings)
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.progress = progress
+        self.lock = threading.Lock()
+        self.stats = {"texts": 0, "batches": 0, "retries": 0, "seconds": 0.0, "texts_per_second": 0.0}
+
+    def _embed_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embeddings.embed_documents(batch)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                with self.lock:
+                    self.stats["retries"] += 1
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    def embed_documents(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        start = time.perf_counter()
+        done = 0
+        vectors = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            # map keeps batch order, so vectors line up with texts
+            for batch, result in zip(batches, executor.map(self._embed_batch, batches)):
+                vectors.extend(result)
+                done += len(batch)
+                if self.progress:
+                    self.progress(done, len(texts))
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += len(batches)
+            self.stats["seconds"] += elapsed
+            if self.stats["seconds"]:
+                self.stats["texts_per_second"] = self.stats["texts"] / self.stats["seconds"]
+        if texts:
+            logger.info(
+                "Embedded %d texts in %d batches in %.2fs (%.1f texts/s)",
+                len(texts), len(batches), elapsed, len(texts) / elapsed if elapsed else 0.0,
+            )
+        return vectors
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def load_vector_db(texts, embeddings, index_dir):
+    """Load the FAISS index persisted in index_dir, rebuilding it when the texts or model changed"""
+    from langchain_community.vectorstores import FAISS
+
+    unique = {}
+    for text in texts:
+        unique.setdefault(text_id(text), text)
+    ids = list(unique.keys())
+
+    fingerprint = hashlib.sha256(
+        "\n".join([model_name(embeddings)] + sorted(ids)).encode("utf-8")
+    ).hexdigest()
+    manifest_path = os.path.join(index_dir, "manifest.json")
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("fingerprint") == fingerprint:
+            # The index files are written by save_local below, never taken from elsewhere
+            return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+
+    vector_db = FAISS.from_texts(list(unique.values()), embeddings, ids=ids)
+    os.makedirs(index_dir, exist_ok=True)
+    vector_db.save_local(index_dir)
+    with open(manifest_path, "w") as f:
+        json.dump({"fingerprint": fingerprint, "model": model_name(embeddings), "count": len(ids)}, f)
+    return vector_db
@@ -0,0 +1,277 @@
+import re
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+
+# A local stand-in for the parts of the Ollama HTTP API the agents use, for tests and benchmarks
+
+
+def embed(text, dimensions=64):
+    """Deterministic pseudo-embedding, so equal texts get equal vectors"""
+    digest = b""
+    counter = 0
+    while len(digest) < dimensions:
+        digest += hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        counter += 1
+    return [byte / 255.0 - 0.5 for byte in digest[:dimensions]]
+
+def default_reply(messages, tools):
+    question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    return {"role": "assistant", "content": f"This is a stubbed answer to: {question}"}
+
+def keep_alive_seconds(value, default=300):
+    """Parse an Ollama keep_alive ("5m", "1h30m", seconds); negative means forever"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    if re.fullmatch(r"-?\d+(\.\d+)?", value):
+        return float(value)
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(number) * units[unit] for number, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value))
+
+
+class FakeOllama:
+    """Serves reply(messages, tools) as the model's answer.
+
+    latency is the delay before the first token, tokens_per_second the generation speed
+    (None for no delay) and embed_latency the delay of every embedding request, so
+    benchmarks can run against a model with known, repeatable timings.
+    """
+
+    def __init__(
+        self,
+        reply=default_reply,
+        models=("llama3.1:latest",),
+        load_delay=0.0,
+        latency=0.0,
+        tokens_per_second=None,
+        embed_latency=0.0,
+    ):
+        self.reply = reply
+        self.models = list(models)
+        self.load_delay = load_delay
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.embed_latency = embed_latency
+        self.requests = []
+        # Model name -> time it expires, like Ollama's memory residency (None = never)
+        self.loaded = {}
+        self.loads = 0
+
+    async def load(self, body):
+        """Simulate loading the model on first use and refresh its keep_alive; returns load_duration"""
+        name = body.get("model")
+        now = time.time()
+        expires = self.loaded.get(name, 0)
+        cold = expires is not None and expires <= now
+        if cold:
+            self.loads += 1
+            await asyncio.sleep(self.load_delay)
+        seconds = keep_alive_seconds(body.get("keep_alive"))
+        if seconds == 0:
+            self.loaded.pop(name, None)
+        else:
+            self.loaded[name] = None if seconds < 0 else time.time() + seconds
+        return int(self.load_delay * 1e9) if cold else 0
+
+    def _now(self):
+        return datetime.now(timezone.utc).isoformat()
+
+    async def _generate(self, tokens):
+        """Wait as long as generating this many tokens would take"""
+        if self.tokens_per_second:
+            await asyncio.sleep(tokens / self.tokens_per_second)
+
+    def _prompt_tokens(self, messages):
+        return sum(len((m.get("content") or "").split()) for m in messages)
+
+    async def chat(self, request):
+        body = await request.json()
+        self.requests.append(("chat", body))
+        load_duration = await self.load(body)
+        message = self.reply(body.get("messages", []), body.get("tools"))
+        prompt_tokens = self._prompt_tokens(body.get("messages", []))
+        tokens = message.get("content", "").split(" ")
+        await asyncio.sleep(self.latency)
+        final = {
+            "model": body["model"],
+            "created_at": self._now(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": 0,
+            "load_duration": load_duration,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": 0,
+            "eval_count": len(tokens),
+            "eval_duration": 0,
+        }
+
+        if not body.get("stream", True):
+            await self._generate(len(tokens))
+            return web.json_response({**final, "message": message})
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for i, token in enumerate(tokens):
+            await self._generate(1)
+            chunk = {
+                "model": body["model"],
+                "created_at": self._now(),
+                "message": {"role": "assistant", "content": token if i == 0 else " " + token},
+                "done": False,
+            }
+            await response.write((json.dumps(chunk) + "\n").encode("utf-8"))
+        if message.get("tool_calls"):
+            final["message"] = {"role": "assistant", "content": "", "tool_calls": message["tool_calls"]}
+        else:
+            final["message"] = {"role": "assistant", "content": ""}
+        await response.write((json.dumps(final) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def embed(self, request):
+        body = await request.json()
+        self.requests.append(("embed", body))
+        load_duration = await self.load(body)
+        await asyncio.sleep(self.embed_latency)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return web.json_response(
+            {"model": body["model"], "embeddings": [embed(text) for text in inputs], "load_duration": load_duration}
+        )
+
+    async def embeddings(self, request):
+        body = await request.json()
+        self.requests.append(("embeddings", body))
+        await asyncio.sleep(self.embed_latency)
+        return web.json_response({"embedding": embed(body["prompt"])})
+
+    async def openai_chat(self, request):
+        """Ollama's OpenAI compatible endpoint, for clients such as ChatOpenAI"""
+        body = await request.json()
+        self.requests.append(("openai_chat", body))
+        await self.load(body)
+        message = self.reply(body.get("messages", []), body.get("tools"))
+        tokens = message.get("content", "").split(" ")
+        tool_calls = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": call["function"]["name"], "arguments": json.dumps(call["function"]["arguments"])},
+            }
+            for call in message.get("tool_calls", [])
+        ]
+        reply = {"role": "assistant", "content": message.get("content", "")}
+        if tool_calls:
+            reply["tool_calls"] = tool_calls
+        usage = {
+            "prompt_tokens": self._prompt_tokens(body.get("messages", [])),
+            "completion_tokens": len(tokens),
+            "total_tokens": self._prompt_tokens(body.get("messages", [])) + len(tokens),
+        }
+        completion = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "system_fingerprint": "fp_ollama",
+        }
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        await asyncio.sleep(self.latency)
+
+        if not body.get("stream"):
+            await self._generate(len(tokens))
+            return web.json_response({
+                **completion,
+                "choices": [{"index": 0, "message": reply, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(delta, finish=None):
+            chunk = {**completion, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": delta, "finish_reason": finish}
+            ]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        if reply["content"]:
+            for i, token in enumerate(tokens):
+                await self._generate(1)
+                await send({"role": "assistant", "content": token if i == 0 else " " + token})
+        if tool_calls:
+            await send({"role": "assistant", "tool_calls": [{"index": i, **call} for i, call in enumerate(tool_calls)]})
+        await send({}, finish_reason)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await response.write(f"data: {json.dumps({**completion, 'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def generate(self, request):
+        body = await request.json()
+        self.requests.append(("generate", body))
+        load_duration = await self.load(body)
+        # An empty prompt only loads the model, as in Ollama
+        text = f"This is a stubbed completion of: {body['prompt']}" if body.get("prompt") else ""
+        return web.json_response({
+            "model": body["model"],
+            "created_at": self._now(),
+            "response": text,
+            "done": True,
+            "done_reason": "load" if not text else "stop",
+            "load_duration": load_duration,
+        })
+
+    async def ps(self, request):
+        now = time.time()
+        models = []
+        for name, expires in list(self.loaded.items()):
+            if expires is not None and expires <= now:
+                del self.loaded[name]
+                continue
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires - now) if expires else None
+            models.append({"name": name, "model": name, "expires_at": expires_at.isoformat() if expires_at else None})
+        return web.json_response({"models": models})
+
+    async def tags(self, request):
+        return web.json_response({"models": [{"name": name, "model": name} for name in self.models]})
+
+    async def version(self, request):
+        return web.json_response({"version": "0.0.0-stub"})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/api/chat", self.chat)
+        app.router.add_post("/api/embed", self.embed)
+        app.router.add_post("/api/embeddings", self.embeddings)
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_post("/v1/chat/completions", self.openai_chat)
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/api/version", self.version)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub Ollama API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Seconds a cold model takes to load")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="Generation speed")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedding request")
+    args = parser.parse_args()
+    server = FakeOllama(
+        load_delay=args.load_delay,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        embed_latency=args.embed_latency,
+    )
+    web.run_app(server.app(), host=args.host, port=args.port)
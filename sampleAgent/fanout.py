@@ -0,0 +1,454 @@
+import os
+import re
+import time
+import sqlite3
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from langchain_core.callbacks import CallbackManagerForToolRun
+from pool import ReadOnlyConnection, readonly_database
+from pager import PagedQueryTool, ResultPager, set_deadline
+from sql_cache import SQL_TOKENS, normalize_sql
+from tracing import tracer
+from validator import ValidateSQLTool, validate_sql
+
+# Pseudo-column holding the name of the database a row comes from
+SOURCE_COLUMN = "source_db"
+
+CLAUSES = re.compile(
+    r"\b(SELECT|FROM|WHERE|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|UNION|INTERSECT|EXCEPT|WINDOW)\b", re.IGNORECASE
+)
+AGGREGATE = re.compile(r"^(COUNT|SUM|TOTAL|MIN|MAX|AVG)\s*\((.*)\)$", re.IGNORECASE | re.DOTALL)
+ANY_AGGREGATE = re.compile(r"\b(COUNT|SUM|TOTAL|MIN|MAX|AVG|GROUP_CONCAT)\s*\(", re.IGNORECASE)
+ALIAS = re.compile(r'^(.*\S)\s+("[^"]*"|\w+)$', re.DOTALL)
+COLUMN = re.compile(r'^(?:(?:"[^"]+"|\w+)\.)?"?(\w+)"?$')
+DIRECTION = re.compile(r"^(.*?)((?:\s+(?:ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?)$", re.IGNORECASE | re.DOTALL)
+
+# How the partial result of each aggregate is combined across databases
+COMBINE = {"count": "SUM", "sum": "SUM", "total": "TOTAL", "min": "MIN", "max": "MAX"}
+
+def mask(sql):
+    """Blank out the inside of literals, quoted identifiers and parentheses, keeping offsets"""
+    chars = list(
+        SQL_TOKENS.sub(lambda m: m.group(1)[0] + " " * (len(m.group(1)) - 2) + m.group(1)[-1] if m.group(1) else m.group(0), sql)
+    )
+    depth = 0
+    for i, char in enumerate(chars):
+        if char == ")":
+            depth -= 1
+        if depth > 0:
+            chars[i] = " "
+        if char == "(":
+            depth += 1
+    return "".join(chars)
+
+def split_commas(text):
+    masked = mask(text)
+    parts, start = [], 0
+    for i, char in enumerate(masked):
+        if char == ",":
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return parts
+
+def bind_source(sql, name):
+    """Replace the source_db pseudo-column outside of literals with the database's name"""
+    literal = "'" + name.replace("'", "''") + "'"
+    return re.sub(
+        r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\b" + SOURCE_COLUMN + r"\b",
+        lambda m: m.group(1) or literal,
+        sql,
+        flags=re.IGNORECASE,
+    )
+
+def same(a, b):
+    return re.sub(r"\s+", "", a).lower() == re.sub(r"\s+", "", b).lower()
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SelectItem:
+    """One expression of a select list, with its alias and aggregate function if it has them"""
+
+    def __init__(self, text):
+        self.expr, self.alias = text, None
+        masked = mask(text)
+        match = ALIAS.match(masked)
+        if (
+            match
+            and match.group(2).upper() != "END"
+            and (re.search(r"\sAS$", match.group(1), re.IGNORECASE) or re.search(r'[\w)"\]]$', match.group(1)))
+        ):
+            self.expr = re.sub(r"\s+AS$", "", text[: match.end(1)], flags=re.IGNORECASE).strip()
+            self.alias = text[match.start(2):].strip().strip('"')
+        column = COLUMN.match(self.expr)
+        # The column name SQLite reports for this item
+        self.name = self.alias or (column.group(1) if column else self.expr)
+        self.function = self.argument = None
+        aggregate = AGGREGATE.match(self.expr)
+        masked = mask(self.expr)
+        # The whole item has to be one call (not "SUM(a) + SUM(b)"), and MIN and MAX with
+        # several arguments are scalar functions
+        if aggregate and masked.count("(") == 1 and "," not in mask(aggregate.group(2)):
+            self.function, self.argument = aggregate.group(1).lower(), aggregate.group(2)
+
+    def matches(self, term):
+        """Whether an ORDER BY or GROUP BY term is this item's expression or alias"""
+        return same(term, self.expr) or (self.alias is not None and same(term.strip('"'), self.alias))
+
+
+def qualifier(term):
+    return term.rsplit(".", 1)[0].strip('"').lower() if "." in term else None
+
+def find_item(term, items):
+    """Position of the select item an ORDER BY or GROUP BY term refers to, or None.
+
+    An exact expression or alias wins; otherwise a column reference matches the one item
+    selecting a column of that name, unless both name different tables.
+    """
+    for i, item in enumerate(items):
+        if item.matches(term):
+            return i
+    column = COLUMN.match(term)
+    if column is None:
+        return None
+    named = []
+    for i, item in enumerate(items):
+        selected = COLUMN.match(item.expr)
+        if selected is None or selected.group(1).lower() != column.group(1).lower():
+            continue
+        if None not in (qualifier(term), qualifier(item.expr)) and qualifier(term) != qualifier(item.expr):
+            continue
+        named.append(i)
+    return named[0] if len(named) == 1 else None
+
+
+class FanOutPlan:
+    """How one query runs on each database and how the partial results are combined.
+
+    Each database runs shard_sql; the rows of all databases are loaded into a "results"
+    table with columns c0, c1, ... plus source_db, and combine_sql produces the answer.
+    """
+
+    def __init__(self, shard_sql, outputs, group_by=(), order_by=(), limit=None, aggregate=False):
+        self.shard_sql = shard_sql
+        self.outputs = outputs
+        self.group_by = group_by
+        self.order_by = order_by
+        self.limit = limit
+        self.aggregate = aggregate
+
+    def combine_sql(self, columns):
+        """SQL over the results table; columns are the names the databases reported"""
+        outputs = self.outputs or [(f"c{i}", name) for i, name in enumerate(columns)]
+        select = [f"{expr} AS {quote(name)}" for expr, name in outputs]
+        source = f"group_concat(DISTINCT {SOURCE_COLUMN})" if self.aggregate else SOURCE_COLUMN
+        sql = f"SELECT {', '.join(select)}, {source} AS {SOURCE_COLUMN} FROM results"
+        if self.group_by:
+            sql += f" GROUP BY {', '.join(self.group_by)}"
+        elif not self.aggregate and not self.order_by:
+            sql += " ORDER BY rowid"
+        if self.order_by:
+            sql += f" ORDER BY {', '.join(self.order_by)}"
+        if self.limit:
+            sql += f" LIMIT {self.limit}"
+        return sql
+
+
+def clauses(sql):
+    """Top-level clauses of a single SELECT, or None for compound and CTE queries"""
+    masked = mask(sql)
+    found = list(CLAUSES.finditer(masked))
+    if not found or found[0].start() != 0 or found[0].group(1).upper() != "SELECT":
+        return None
+    parts = {}
+    for match, following in zip(found, found[1:] + [None]):
+        keyword = re.sub(r"\s+", " ", match.group(1).upper())
+        if keyword in parts or keyword in ("UNION", "INTERSECT", "EXCEPT", "WINDOW"):
+            return None
+        parts[keyword] = sql[match.end(): following.start() if following else len(sql)].strip()
+    return parts
+
+def order_terms(text, items):
+    """ORDER BY terms as output column positions, or None when one is not an output column"""
+    terms = []
+    for term in split_commas(text):
+        match = DIRECTION.match(term)
+        expr, direction = match.group(1).strip(), match.group(2)
+        if expr.isdigit():
+            terms.append(expr + direction)
+            continue
+        position = find_item(expr, items)
+        if position is None or "collate" in expr.lower():
+            return None
+        terms.append(f"{position + 1}{direction}")
+    return terms
+
+def plan_fanout(sql):
+    """Plan a single SELECT for running on every database, or None if its shape is not supported.
+
+    Plain row queries are concatenated and re-sorted and re-limited; simple aggregates
+    (COUNT, SUM, TOTAL, MIN, MAX, AVG with an optional GROUP BY) are computed per database
+    and re-aggregated. HAVING, DISTINCT, compound queries, CTEs and window functions are not.
+    """
+    sql = normalize_sql(sql)
+    parts = clauses(sql)
+    if parts is None or "FROM" not in parts or "HAVING" in parts or re.search(r"\bOVER\b", mask(sql), re.IGNORECASE):
+        return None
+    select = parts["SELECT"]
+    if re.match(r"(DISTINCT|ALL)\b", select, re.IGNORECASE):
+        return None
+    items = [SelectItem(text) for text in split_commas(select)]
+    aggregate = "GROUP BY" in parts or any(item.function for item in items)
+    if any(item.function is None and ANY_AGGREGATE.search(mask(item.expr)) for item in items):
+        return None
+    if any(item.function and re.match(r"DISTINCT\b", item.argument.strip(), re.IGNORECASE) for item in items):
+        return None
+    order_by = []
+    if "ORDER BY" in parts:
+        order_by = order_terms(parts["ORDER BY"], items)
+        if order_by is None:
+            return None
+
+    if not aggregate:
+        if any(item.expr.endswith("*") for item in items) and order_by:
+            return None
+        limit = parts.get("LIMIT")
+        # Each database's first n rows contain the overall first n, but not with an offset
+        shard_sql = sql
+        if limit and ("," in limit or re.search(r"\bOFFSET\b", limit, re.IGNORECASE)):
+            shard_sql = sql[: mask(sql).upper().rindex("LIMIT")].strip()
+        return FanOutPlan(shard_sql, None, order_by=order_by, limit=limit)
+
+    group_terms = split_commas(parts["GROUP BY"]) if "GROUP BY" in parts else []
+    if any(item.function is None for item in items) and not group_terms:
+        return None
+    shard, outputs = [], []
+
+    def column(expr):
+        shard.append(f"{expr} AS c{len(shard)}")
+        return f"c{len(shard) - 1}"
+
+    for item in items:
+        if item.function is None:
+            outputs.append((column(item.expr), item.name))
+        elif item.function == "avg":
+            total, count = column(f"SUM({item.argument})"), column(f"COUNT({item.argument})")
+            outputs.append((f"SUM({total}) * 1.0 / NULLIF(SUM({count}), 0)", item.name))
+        else:
+            outputs.append((f"{COMBINE[item.function]}({column(item.expr)})", item.name))
+    # The shard's own GROUP BY names the grouped expressions themselves: select aliases and
+    # positions no longer mean the same once the select list is rewritten to c0, c1, ...
+    group_by, shard_group_by = [], []
+    for term in group_terms:
+        if term.isdigit():
+            if not 0 < int(term) <= len(items):
+                return None
+            term = items[int(term) - 1].expr
+        position = find_item(term, items)
+        if position is not None and items[position].function is not None:
+            position = None
+        # Grouping terms that are not selected still separate the rows
+        group_by.append(outputs[position][0] if position is not None else column(term))
+        shard_group_by.append(items[position].expr if position is not None else term)
+    shard_sql = f"SELECT {', '.join(shard)} FROM {parts['FROM']}"
+    if "WHERE" in parts:
+        shard_sql += f" WHERE {parts['WHERE']}"
+    if group_terms:
+        shard_sql += f" GROUP BY {', '.join(shard_group_by)}"
+    return FanOutPlan(shard_sql, outputs, group_by=group_by, order_by=order_by, limit=parts.get("LIMIT"), aggregate=True)
+
+
+# Query shapes ShardSet.check runs against Chinook-schema databases. They read one table
+# each: a join in the combined database would pair rows of different databases.
+CHECK_QUERIES = [
+    "SELECT BillingCountry AS country, COUNT(*) AS n FROM Invoice GROUP BY country ORDER BY n DESC, country LIMIT 3",
+    "SELECT strftime('%Y', InvoiceDate) AS y, SUM(Total), AVG(Total) FROM Invoice GROUP BY y ORDER BY y",
+    "SELECT AVG(Total), BillingCountry, MAX(Total) FROM Invoice GROUP BY 2 ORDER BY 2",
+    "SELECT BillingCountry, COUNT(*) FROM Invoice GROUP BY 1",
+    "SELECT strftime('%Y', InvoiceDate), COUNT(*) FROM Invoice GROUP BY strftime('%Y', InvoiceDate)",
+    "SELECT COUNT(*) FROM Invoice GROUP BY CustomerId % 7",
+    "SELECT TrackId, SUM(UnitPrice * Quantity) AS revenue FROM InvoiceLine GROUP BY TrackId ORDER BY revenue DESC, TrackId LIMIT 5",
+    "SELECT InvoiceId, Total FROM Invoice WHERE Total > 15 ORDER BY Total DESC, InvoiceId",
+    "SELECT source_db, COUNT(*) FROM Invoice GROUP BY source_db",
+]
+
+
+class ShardSet:
+    """Databases with the same schema, one per tenant or region, queried all at once.
+
+    The first database stands in for all of them wherever one is enough, for the schema
+    and for query validation. Queries run on every database in a thread pool;
+    sqlite3 releases the GIL while a statement runs, so the databases are read in parallel.
+    """
+
+    def __init__(self, paths, catalog_dir=None, max_workers=8, max_rows=100000, query_timeout=30.0):
+        self.databases = {}
+        for number, (name, path) in enumerate(paths.items()):
+            # Only the first database's schema catalog is ever read
+            self.databases[name] = readonly_database(path, catalog_dir=catalog_dir if number == 0 else None)
+        self.primary = next(iter(self.databases.values()))
+        self.max_rows = max_rows
+        self.query_timeout = query_timeout
+        self.executor = ThreadPoolExecutor(max_workers=min(max_workers, len(paths)), thread_name_prefix="shard")
+
+    @classmethod
+    def from_env(cls, value, **kwargs):
+        """Parse "name=path,name=path" (or bare paths, named after the file)"""
+        paths = {}
+        for entry in value.split(","):
+            name, _, path = entry.strip().rpartition("=")
+            path = path.strip()
+            paths[name.strip() or os.path.splitext(os.path.basename(path))[0]] = path
+        return cls(paths, **kwargs)
+
+    def _run(self, name, sql):
+        start, perf_start = time.time(), time.perf_counter()
+        sql = bind_source(sql, name)
+        connection = self.databases[name]._engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            set_deadline(connection, self.query_timeout)
+            cursor.execute(sql)
+            columns = [column[0] for column in cursor.description or []]
+            rows = cursor.fetchmany(self.max_rows + 1)
+        except sqlite3.Error as e:
+            tracer.sql(sql, start, time.perf_counter() - perf_start, error=str(e), name="shard")
+            raise sqlite3.OperationalError(f"{name}: {e}") from e
+        finally:
+            set_deadline(connection, None)
+            connection.close()
+        tracer.sql(sql, start, time.perf_counter() - perf_start, rows=len(rows), name="shard")
+        if len(rows) > self.max_rows:
+            raise sqlite3.OperationalError(
+                f"{name} returned more than {self.max_rows} rows; filter or aggregate the query"
+            )
+        return columns, rows
+
+    def execute(self, sql):
+        """Run sql on every database and return a connection and a cursor over the combined rows"""
+        plan = plan_fanout(sql) or FanOutPlan(normalize_sql(sql), None)
+        futures = {
+            name: self.executor.submit(contextvars.copy_context().run, self._run, name, plan.shard_sql)
+            for name in self.databases
+        }
+        results = {name: future.result() for name, future in futures.items()}
+        columns = next(iter(results.values()))[0]
+        merged = sqlite3.connect(":memory:", check_same_thread=False, factory=ReadOnlyConnection)
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        merged.execute(f"CREATE TABLE results ({', '.join(f'c{i}' for i in range(len(columns)))}, {SOURCE_COLUMN})")
+        for name, (_, rows) in results.items():
+            merged.executemany(f"INSERT INTO results VALUES ({placeholders})", (tuple(row) + (name,) for row in rows))
+        try:
+            cursor = merged.execute(plan.combine_sql(columns))
+        except sqlite3.Error:
+            merged.close()
+            raise
+        return merged, cursor
+
+    def check(self, queries=None):
+        """Compare merged results with the same queries on one database holding every table's rows.
+
+        Returns (query, expected, got) for each query whose results differ; rows are compared
+        in order when the query has an ORDER BY, and as a multiset otherwise.
+        """
+        combined = sqlite3.connect(":memory:")
+        try:
+            names = list(self.databases)
+            for number, name in enumerate(names):
+                path = self.databases[name]._engine.url.database
+                combined.execute(f"ATTACH DATABASE ? AS s{number}", (f"file:{path}?mode=ro",))
+            for (table,) in combined.execute("SELECT name FROM s0.sqlite_master WHERE type = 'table'").fetchall():
+                union = " UNION ALL ".join(
+                    f"SELECT *, '{name.replace(chr(39), chr(39) * 2)}' AS {SOURCE_COLUMN} FROM s{number}.{quote(table)}"
+                    for number, name in enumerate(names)
+                )
+                combined.execute(f"CREATE TABLE main.{quote(table)} AS {union}")
+
+            def rows(cursor, ordered, width=None):
+                result = [
+                    tuple(round(v, 6) if isinstance(v, float) else v for v in row[:width]) for row in cursor.fetchall()
+                ]
+                return result if ordered else sorted(result, key=repr)
+
+            mismatches = []
+            for sql in queries or CHECK_QUERIES:
+                ordered = "ORDER BY" in (clauses(normalize_sql(sql)) or {})
+                expected = rows(combined.execute(sql), ordered)
+                try:
+                    connection, cursor = self.execute(sql)
+                except sqlite3.Error as e:
+                    mismatches.append((sql, expected, f"Error: {e}"))
+                    continue
+                try:
+                    # Merged rows carry the source column on top of what the query selects
+                    got = rows(cursor, ordered, width=-1)
+                finally:
+                    connection.close()
+                if got != expected:
+                    mismatches.append((sql, expected, got))
+            return mismatches
+        finally:
+            combined.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class FanOutPager(ResultPager):
+    """ResultPager whose queries run on every database of a ShardSet"""
+
+    def __init__(self, shards, **kwargs):
+        super().__init__(shards.primary, **kwargs)
+        self.shards = shards
+
+    def _cached(self, query, compute):
+        # The result cache only watches the first database for changes
+        return compute()
+
+    def _execute(self, query):
+        return self.shards.execute(query)
+
+    def open(self, query):
+        text = super().open(query)
+        if not text.startswith("Error") and plan_fanout(query) is None:
+            text = "(rows of each database in turn; this kind of query is not combined across databases)\n" + text
+        return text
+
+
+class FanOutQueryTool(PagedQueryTool):
+    """sql_db_query over every database of a ShardSet"""
+
+    description: str = f"""
+    Execute a SQL query against all databases at once and get back the combined result.
+    The databases have the same schema; every row has a {SOURCE_COLUMN} column naming its database,
+    and {SOURCE_COLUMN} can be used in the query like any column.
+    COUNT, SUM, MIN, MAX and AVG with GROUP BY are combined across databases: rows with the same
+    GROUP BY values in different databases become one row. Add {SOURCE_COLUMN} to the GROUP BY to keep databases apart.
+    Long results are returned one page at a time; use sql_db_next_page with the given handle for more rows.
+    If the query is not correct, an error message will be returned.
+    If an error is returned, rewrite the query, check the query, and try again.
+    """
+
+
+class FanOutValidateSQLTool(ValidateSQLTool):
+    """sql_db_query_checker that accepts the source_db pseudo-column"""
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        checked, error = validate_sql(self.db, bind_source(query, "source"))
+        return error or normalize_sql(query)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python fanout.py a.db b.db ... (or SQLITE_DATABASES): check merged results on Chinook copies
+    shards = ShardSet.from_env(",".join(sys.argv[1:]) or os.environ["SQLITE_DATABASES"])
+    mismatches = shards.check()
+    for sql, expected, got in mismatches:
+        print(f"MISMATCH {sql}\n  expected {expected[:5]}\n  got      {got if isinstance(got, str) else got[:5]}")
+    print(f"{len(CHECK_QUERIES) - len(mismatches)}/{len(CHECK_QUERIES)} queries match")
+    shards.close()
+    sys.exit(1 if mismatches else 0)
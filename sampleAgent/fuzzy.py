@@ -0,0 +1,131 @@
+import heapq
+import threading
+from collections import Counter, defaultdict
+from typing import Any
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from embeddings import normalize_text, text_id
+
+
+def fold(text):
+    return normalize_text(text).lower()
+
+def trigrams(folded):
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def levenshtein(a, b):
+    """Edit distance using Myers' bit-parallel algorithm, one pass over b"""
+    if not a:
+        return len(b)
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    pv, mv, score = mask, 0, len(a)
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
+
+
+class TrigramIndex:
+    """In-memory trigram index over proper nouns, rescored by edit distance"""
+
+    def __init__(self, texts=(), candidates=20):
+        self.candidates = candidates
+        self.texts = {}
+        self.folded = {}
+        self.grams = {}
+        self.postings = defaultdict(set)
+        self.lock = threading.Lock()
+        for text in texts:
+            self.add(text)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, text):
+        key = text_id(text)
+        with self.lock:
+            if key in self.texts:
+                return key
+            folded = fold(text)
+            grams = trigrams(folded)
+            self.texts[key] = text
+            self.folded[key] = folded
+            self.grams[key] = grams
+            for gram in grams:
+                self.postings[gram].add(key)
+        return key
+
+    def remove(self, key):
+        with self.lock:
+            if key not in self.texts:
+                return
+            del self.texts[key]
+            del self.folded[key]
+            for gram in self.grams.pop(key):
+                self.postings[gram].discard(key)
+                if not self.postings[gram]:
+                    del self.postings[gram]
+
+    def search(self, query, k=5):
+        """Return up to k (text, score) pairs, best first, with scores between 0 and 1"""
+        needle = fold(query)
+        grams = trigrams(needle)
+        with self.lock:
+            overlap = Counter()
+            for gram in grams:
+                overlap.update(self.postings.get(gram, ()))
+
+            # Trigram Dice coefficient picks the candidates, edit distance breaks the ties
+            dice = {key: 2 * count / (len(grams) + len(self.grams[key])) for key, count in overlap.items()}
+            shortlist = heapq.nlargest(self.candidates, dice, key=dice.get)
+            scored = []
+            for key in shortlist:
+                candidate = self.folded[key]
+                similarity = 1 - levenshtein(needle, candidate) / max(len(needle), len(candidate), 1)
+                scored.append((self.texts[key], (dice[key] + similarity) / 2))
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:k]
+
+
+class FuzzyRetriever(BaseRetriever):
+    """Retriever over a TrigramIndex, no embedding model involved"""
+
+    index: Any
+    k: int = 5
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return [
+            Document(page_content=text, metadata={"score": score})
+            for text, score in self.index.search(query, self.k)
+        ]
+
+
+class TieredRetriever(BaseRetriever):
+    """Answers from the fuzzy index when its best match is confident, otherwise asks the fallback"""
+
+    index: Any
+    fallback: BaseRetriever
+    k: int = 5
+    threshold: float = 0.6
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        matches = self.index.search(query, self.k)
+        if matches and matches[0][1] >= self.threshold:
+            return [Document(page_content=text, metadata={"score": score}) for text, score in matches]
+        return self.fallback.invoke(query, config={"callbacks": run_manager.get_child()})
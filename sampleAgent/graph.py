@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 from langchain_core.tools import tool
 from langchain.pydantic_v1 import BaseModel, Field
 from typing import Dict
@@ -12,6 +11,11 @@ class GraphDataModel(BaseModel):
 @tool
 def draw_bar_graph(data: Dict[str, float], title: str, xlabel: str, ylabel: str) -> str:
     """Draw a Bar Graph"""
+    # pyplot is only imported once a chart is actually drawn
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     countries = list(data.keys())
     values = list(data.values())
 
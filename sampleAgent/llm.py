@@ -1,18 +1,134 @@
-from langchain_ollama.chat_models import ChatOllama
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from langchain.agents.agent_toolkits import create_retriever_tool
+import os
+import re
+from config import cache_dir
+from embeddings import BatchEmbeddings, EmbeddingCache, OllamaEmbedder, load_vector_db
+from refresh import IndexRefresher
+from fuzzy import FuzzyRetriever, TieredRetriever, TrigramIndex
+from models import ModelManager
+from prompt import prefix_monitor
 
-def initialize_llm():
-    return ChatOllama(model="llama3.1:latest")
+CHAT_MODEL = "llama3.1:latest"
 
-def initialize_tools(llm, db, artists, albums):
+# How long Ollama keeps the models in memory after the last request
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# Source columns of the proper nouns offered by search_proper_nouns
+PROPER_NOUN_SOURCES = {"Artist": "Name", "Album": "Title"}
+
+# Provider packages are imported inside the functions that need them, so a run only pays
+# for the backends it is configured to use
+
+def initialize_llm(cache=None):
+    from langchain_ollama.chat_models import ChatOllama
+
+    # Identical requests (model, parameters, bound tools and messages) are answered from a
+    # local SQLite cache; set LLM_CACHE=0 to turn it off or LLM_CACHE_BYPASS=1 to refresh it
+    if cache is None:
+        cache = os.environ.get("LLM_CACHE", "1") != "0"
+    if cache is True:
+        from llm_cache import ResponseCache
+
+        cache = ResponseCache(os.path.join(cache_dir(), "llm_cache.sqlite"))
+    return ChatOllama(model=CHAT_MODEL, keep_alive=KEEP_ALIVE, cache=cache or None, callbacks=[prefix_monitor])
+
+def initialize_models(ping_interval=None):
+    """Start loading the Ollama models in the background and keep them resident"""
+    models = {CHAT_MODEL: "chat"}
+    if os.environ.get("EMBEDDINGS_BACKEND", "openai") == "ollama":
+        models.setdefault(os.environ.get("OLLAMA_EMBED_MODEL", "llama3.1:latest"), "embed")
+    ping_interval = ping_interval or float(os.environ.get("OLLAMA_PING_INTERVAL", 240))
+    return ModelManager(models, keep_alive=KEEP_ALIVE, ping_interval=ping_interval).start()
+
+def initialize_embeddings(backend=None, batch_size=64, max_concurrency=4):
+    backend = backend or os.environ.get("EMBEDDINGS_BACKEND", "openai")
+    if backend == "ollama":
+        embeddings = OllamaEmbedder(
+            model=os.environ.get("OLLAMA_EMBED_MODEL", "llama3.1:latest"), pool_size=max_concurrency, keep_alive=KEEP_ALIVE
+        )
+    elif backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings(chunk_size=batch_size)
+    else:
+        raise ValueError(f"Unknown embeddings backend: {backend}")
+    return BatchEmbeddings(embeddings, batch_size=batch_size, max_concurrency=max_concurrency)
+
+def initialize_retriever(db, texts, backend=None, embeddings=None, refresh_interval=30.0):
+    # "embedding" searches FAISS, "fuzzy" only the local trigram index, and "hybrid"
+    # answers from the trigram index unless it has no confident match
+    backend = backend or os.environ.get("RETRIEVER_BACKEND", "embedding")
+    if backend not in ("embedding", "fuzzy", "hybrid"):
+        raise ValueError(f"Unknown retriever backend: {backend}")
+
+    vector_db = fuzzy_index = None
+    if backend != "fuzzy":
+        embeddings = EmbeddingCache(embeddings or initialize_embeddings(), os.path.join(cache_dir(), "embeddings.sqlite"))
+        index_dir = cache_dir("faiss", re.sub(r"[^\w.-]", "_", embeddings.model))
+        vector_db = load_vector_db(texts, embeddings, index_dir)
+    if backend != "embedding":
+        fuzzy_index = TrigramIndex(texts)
+
+    refresher = IndexRefresher(
+        db._engine.url.database,
+        PROPER_NOUN_SOURCES,
+        vector_db=vector_db,
+        embeddings=embeddings,
+        fuzzy_index=fuzzy_index,
+        interval=refresh_interval,
+    ).start()
+
+    if backend == "fuzzy":
+        return FuzzyRetriever(index=fuzzy_index, k=5)
+    if backend == "hybrid":
+        return TieredRetriever(index=fuzzy_index, fallback=refresher.as_retriever(k=5), k=5)
+    return refresher.as_retriever(k=5)
+
+def initialize_tools(
+    llm,
+    db,
+    artists,
+    albums,
+    embeddings=None,
+    refresh_interval=30.0,
+    retriever_backend=None,
+    shards=None,
+    aggregates=None,
+):
+    from langchain_community.agent_toolkits import SQLDatabaseToolkit
+    from langchain.agents.agent_toolkits import create_retriever_tool
+    from validator import ValidateSQLTool
+    from pager import NextPageTool, PagedQueryTool, ResultPager
+
+    # Queries are checked locally by SQLite rather than by an extra LLM generation, and the
+    # query tool itself refuses anything that is not read-only. Results come back a page at a
+    # time so a missing LIMIT cannot flood the context
+    page_size = dict(
+        max_rows=int(os.environ.get("QUERY_PAGE_ROWS", 50)),
+        max_bytes=int(os.environ.get("QUERY_PAGE_BYTES", 4000)),
+    )
+    if shards is None:
+        pager = ResultPager(db, **page_size)
+        local_tools = {"sql_db_query": PagedQueryTool(db=db, pager=pager), "sql_db_query_checker": ValidateSQLTool(db=db)}
+    else:
+        from fanout import FanOutPager, FanOutQueryTool, FanOutValidateSQLTool
+
+        # One query runs on every database and the results are combined
+        pager = FanOutPager(shards, **page_size)
+        local_tools = {
+            "sql_db_query": FanOutQueryTool(db=db, pager=pager),
+            "sql_db_query_checker": FanOutValidateSQLTool(db=db),
+        }
     toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-    tools = toolkit.get_tools()
+    tools = [local_tools.get(tool.name, tool) for tool in toolkit.get_tools()]
+    tools.append(NextPageTool(pager=pager))
+    if aggregates is not None:
+        from aggregates import SalesSummaryTool
 
-    vector_db = FAISS.from_texts(artists + albums, OpenAIEmbeddings())
-    retriever = vector_db.as_retriever(search_kwargs={"k": 5})
+        tools.append(SalesSummaryTool(aggregates=aggregates))
+
+    retriever = initialize_retriever(
+        db, artists + albums, backend=retriever_backend, embeddings=embeddings, refresh_interval=refresh_interval
+    )
     description = "Use to look up values to filter on. Input is an approximate spelling of the proper noun, output is valid proper nouns. Use the noun most similar to the search."
     
     retriever_tool = create_retriever_tool(
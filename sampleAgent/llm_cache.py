@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import warnings
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core._api import LangChainBetaWarning
+
+# loads() warns on every call that it is in beta, which would print on every cache hit
+warnings.filterwarnings("ignore", message="The function `loads` is in beta", category=LangChainBetaWarning)
+
+# Message fields that differ between otherwise identical conversations: run and tool call
+# ids generated per request, and provider metadata such as timestamps and durations
+VOLATILE_FIELDS = {"id", "tool_call_id", "response_metadata", "usage_metadata"}
+
+def canonicalize(value):
+    if isinstance(value, dict):
+        if "lc" in value and isinstance(value.get("kwargs"), dict):
+            kwargs = {k: canonicalize(v) for k, v in value["kwargs"].items() if k not in VOLATILE_FIELDS}
+            return {**value, "kwargs": kwargs}
+        if value.get("type") == "tool_call":
+            value = {k: v for k, v in value.items() if k != "id"}
+        return {k: canonicalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [canonicalize(v) for v in value]
+    return value
+
+def cache_key(prompt, llm_string):
+    try:
+        prompt = json.dumps(canonicalize(json.loads(prompt)), sort_keys=True)
+    except ValueError:
+        pass
+    return hashlib.sha256(f"{prompt}\0{llm_string}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache(BaseCache):
+    """Exact-match chat model response cache in a local SQLite file.
+
+    Keys cover the model parameters and bound tool schemas (LangChain's llm_string) and the
+    canonicalized message list. Entries expire after ttl seconds and the least recently used
+    ones are evicted beyond max_entries or max_bytes. With bypass set, lookups always miss
+    but fresh responses are still stored.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=10000, max_bytes=256 * 1024 * 1024, bypass=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = os.environ.get("LLM_CACHE_BYPASS") == "1" if bypass is None else bypass
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+
+    def lookup(self, prompt, llm_string):
+        if self.bypass:
+            return None
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        generations = [loads(generation) for generation in json.loads(row[0])]
+        for generation in generations:
+            # Tells PrefixCacheMonitor that Ollama never saw this request
+            message = getattr(generation, "message", None)
+            if message is not None:
+                message.response_metadata["cached"] = True
+        return generations
+
+    def update(self, prompt, llm_string, return_val):
+        key = cache_key(prompt, llm_string)
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, llm_string, value, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, llm_string, value, len(value), now, now),
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now):
+        if self.ttl:
+            self.conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count, size = self.conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        removed = 0
+        for key, entry_size in self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ).fetchall():
+            if count - removed <= self.max_entries and size <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            removed += 1
+            size -= entry_size
+
+    def clear(self, **kwargs):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            count, size = self.conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": size}
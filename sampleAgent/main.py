@@ -1,28 +1,28 @@
-from config import load_env_variables
-from database import db, query_as_list
-from llm import initialize_llm, initialize_tools
-from agent import create_agent
-from utils import pretty_print
+import os
+from app import build_agent
+from utils import stream_print
+from prompt import prefix_monitor
 from langchain_core.messages import HumanMessage
 
-# Load environment variables
-load_env_variables()
+# METRICS_PORT=9464 serves the stage metrics at http://127.0.0.1:9464/metrics while running
+if os.environ.get("METRICS_PORT"):
+    from tracing import serve_metrics
 
-# Initialize Database
-artists = query_as_list(db, "SELECT Name FROM Artist")
-albums = query_as_list(db, "SELECT Title FROM Album")
-
-# Initialize LLM and Tools
-llm = initialize_llm()
-tools = initialize_tools(llm, db, artists, albums)
+    serve_metrics(int(os.environ["METRICS_PORT"]))
 
 # Create and run the agent
-agent = create_agent(llm, tools, db)
+agent = build_agent()
 
 # Prompt user for a question
 user_question = input("Please enter your question: ")
 
-# Process the question
-for s in agent.stream({"messages": [HumanMessage(content=user_question)]}):
-    pretty_print(s)
-    print("----")
+# Process the question, printing tokens as they arrive
+stream_print(agent, {"messages": [HumanMessage(content=user_question)]})
+
+stats = prefix_monitor.stats()
+if stats["calls"]:
+    print(
+        f"Prompt cache: {stats['cache_hit_rate']:.0%} of prompt tokens reused, "
+        f"{stats['prefix_reuse']:.0%} of the prompt text repeated a recent request, "
+        f"{stats['prompt_eval_seconds']:.2f}s evaluating prompts"
+    )
@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import threading
+import requests
+
+logger = logging.getLogger(__name__)
+
+def ollama_url(base_url=None):
+    url = (base_url or os.environ.get("OLLAMA_HOST") or "http://localhost:11434").rstrip("/")
+    return url if "://" in url else "http://" + url
+
+
+class ModelManager:
+    """Keeps the Ollama models the agent uses loaded.
+
+    models maps a model name to "chat" or "embed". preload() loads each one with an explicit
+    keep_alive and records how long the load took; start() then checks /api/ps every
+    ping_interval seconds and sends a minimal request to each model, which extends its
+    keep_alive or loads it again if Ollama has unloaded it anyway.
+    """
+
+    def __init__(self, models, base_url=None, keep_alive="30m", ping_interval=240.0, timeout=300):
+        self.base_url = ollama_url(base_url)
+        self.models = dict(models)
+        self.keep_alive = keep_alive
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.state = {
+            name: {
+                "kind": kind,
+                "loaded": False,
+                "loads": 0,
+                "pings": 0,
+                "errors": 0,
+                "load_seconds": None,
+                "last_ping": None,
+                "last_error": None,
+            }
+            for name, kind in self.models.items()
+        }
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _touch(self, name):
+        """Send the smallest request that makes Ollama load the model and reset its keep_alive"""
+        if self.models[name] == "embed":
+            path, payload = "/api/embed", {"model": name, "input": ""}
+        else:
+            path, payload = "/api/generate", {"model": name, "prompt": ""}
+        payload["keep_alive"] = self.keep_alive
+        response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def resident(self):
+        """Names of the models Ollama currently holds in memory"""
+        response = self.session.get(self.base_url + "/api/ps", timeout=self.timeout)
+        response.raise_for_status()
+        return {model["name"] for model in response.json().get("models", [])}
+
+    def load(self, name):
+        start = time.perf_counter()
+        try:
+            body = self._touch(name)
+        except requests.RequestException as e:
+            with self.lock:
+                self.state[name].update(loaded=False, errors=self.state[name]["errors"] + 1, last_error=str(e))
+            logger.warning("Could not load %s: %s", name, e)
+            return False
+        seconds = time.perf_counter() - start
+        with self.lock:
+            state = self.state[name]
+            state.update(loaded=True, loads=state["loads"] + 1, last_ping=time.time(), last_error=None)
+            # Ollama reports the time it spent loading weights; a warm model reports (almost) none
+            state["load_seconds"] = body.get("load_duration", 0) / 1e9 if "load_duration" in body else seconds
+        logger.info("Loaded %s in %.2fs", name, seconds)
+        return True
+
+    def preload(self):
+        for name in self.models:
+            self.load(name)
+        return self
+
+    def ping(self):
+        try:
+            resident = self.resident()
+        except requests.RequestException as e:
+            logger.warning("Could not list loaded models: %s", e)
+            resident = None
+        for name in self.models:
+            if resident is not None and name not in resident:
+                with self.lock:
+                    self.state[name]["loaded"] = False
+                # Unloaded despite the keep_alive (memory pressure, restart): load it again now
+                self.load(name)
+                continue
+            try:
+                self._touch(name)
+            except requests.RequestException as e:
+                with self.lock:
+                    self.state[name].update(errors=self.state[name]["errors"] + 1, last_error=str(e))
+                continue
+            with self.lock:
+                self.state[name].update(loaded=True, pings=self.state[name]["pings"] + 1, last_ping=time.time())
+
+    def _run(self, preload):
+        if preload:
+            self.preload()
+        while not self._stop.wait(self.ping_interval):
+            self.ping()
+
+    def start(self, preload=True):
+        """Preload in the background, so model loading overlaps the rest of the startup work"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(preload,), name="ollama-keep-alive", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def metrics(self):
+        with self.lock:
+            return {name: dict(state) for name, state in self.state.items()}
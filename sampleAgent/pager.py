@@ -0,0 +1,228 @@
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Type
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.tools import BaseTool
+from sql_cache import normalize_sql
+from validator import ReadOnlyQueryTool
+from tracing import tracer
+
+def set_deadline(connection, seconds):
+    # Pooled connections wrap the sqlite3 connection that carries the deadline
+    target = getattr(connection, "dbapi_connection", connection)
+    target.deadline = time.monotonic() + seconds if seconds else None
+
+def render_value(value, max_length):
+    text = "NULL" if value is None else str(value)
+    text = text.replace("\n", " ")
+    return text if len(text) <= max_length else text[: max_length - 3] + "..."
+
+
+class ResultPager:
+    """Reads query results page by page from an open cursor.
+
+    A page stops at max_rows rows or max_bytes of rendered text, whichever comes first. When
+    rows are left, the cursor stays open under a short handle so the next page continues
+    where this one stopped instead of running the query again. At most max_handles cursors
+    (each holding a pooled connection) are kept. An open read blocks writers to a
+    rollback-journal database, so a background reaper closes idle ones after ttl seconds
+    even when no further call arrives.
+
+    First pages go through the database's result cache, like db.run() results. A handle
+    whose first page came from the cache has no cursor yet; the query only runs again, past
+    the rows already shown, if the next page is asked for.
+    """
+
+    def __init__(self, db, max_rows=50, max_bytes=4000, max_value_length=100, max_handles=4, ttl=60.0, query_timeout=30.0):
+        self.db = db
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_value_length = max_value_length
+        self.max_handles = max_handles
+        self.ttl = ttl
+        self.query_timeout = query_timeout
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper = None
+
+    def _close(self, result):
+        if result["cursor"] is not None:
+            result["cursor"].close()
+            result["connection"].close()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self.results:
+            handle, result = next(iter(self.results.items()))
+            if len(self.results) <= self.max_handles and now - result["last_used"] < self.ttl:
+                break
+            del self.results[handle]
+            self._close(result)
+
+    def _reap(self):
+        while not self._stop.wait(min(self.ttl, 10.0)):
+            with self.lock:
+                self._expire()
+
+    def _keep(self, handle, result):
+        result["last_used"] = time.monotonic()
+        with self.lock:
+            self.results[handle] = result
+            self._expire()
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="result-reaper", daemon=True)
+                self._reaper.start()
+
+    def _page(self, result):
+        """Render the next page and leave the cursor positioned after it"""
+        if result["cursor"] is None:
+            # The rows shown so far came from the cache, so run the query now and skip them
+            result["connection"], result["cursor"] = self._execute(result["query"])
+            for _ in range(result["offset"]):
+                if result["cursor"].fetchone() is None:
+                    break
+        connection = result["connection"]
+        set_deadline(connection, self.query_timeout)
+        lines = []
+        size = len(result["header"])
+        row = result.pop("next_row", None) or result["cursor"].fetchone()
+        while row is not None:
+            line = " | ".join(render_value(value, self.max_value_length) for value in row)
+            # Always return at least one row, however long
+            if lines and (len(lines) >= self.max_rows or size + len(line) + 1 > self.max_bytes):
+                result["next_row"] = row
+                break
+            lines.append(line)
+            size += len(line) + 1
+            row = result["cursor"].fetchone()
+        set_deadline(connection, None)
+        first = result["offset"] + 1
+        result["offset"] += len(lines)
+        return first, lines, row is not None
+
+    def _format(self, handle, result, first, lines, more):
+        if not lines:
+            return f"{result['header']}\n(no rows)"
+        footer = f"(rows {first}-{result['offset']}"
+        if more:
+            footer += f", more rows available: call sql_db_next_page with handle {handle})"
+        else:
+            footer += ", end of results)"
+        return "\n".join([result["header"], *lines, footer])
+
+    def _execute(self, query):
+        """Run query and return its connection and a cursor positioned before the first row"""
+        connection = self.db._engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            set_deadline(connection, self.query_timeout)
+            cursor.execute(query)
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return connection, cursor
+
+    def _cached(self, query, compute):
+        cached = getattr(self.db, "cached", None)
+        if cached is None:
+            return compute()
+        return cached(("page", normalize_sql(query), self.max_rows, self.max_bytes, self.max_value_length), compute)
+
+    def open(self, query):
+        opened = {}
+
+        def first_page():
+            start, perf_start = time.time(), time.perf_counter()
+            try:
+                connection, cursor = self._execute(query)
+                columns = [column[0] for column in cursor.description or []]
+                result = {"connection": connection, "cursor": cursor, "header": " | ".join(columns), "offset": 0}
+                result["query"] = query
+                try:
+                    _, lines, more = self._page(result)
+                except sqlite3.Error:
+                    self._close(result)
+                    raise
+            except sqlite3.Error as e:
+                tracer.sql(query, start, time.perf_counter() - perf_start, error=str(e))
+                raise
+            tracer.sql(query, start, time.perf_counter() - perf_start, rows=len(lines))
+            if more:
+                opened["result"] = result
+            else:
+                self._close(result)
+            return result["header"], lines, more
+
+        try:
+            header, lines, more = self._cached(query, first_page)
+        except sqlite3.Error as e:
+            return f"Error: {e}"
+        result = opened.get("result") or {
+            "connection": None, "cursor": None, "header": header, "offset": len(lines), "query": query
+        }
+        handle = uuid.uuid4().hex[:8]
+        if more:
+            self._keep(handle, result)
+        return self._format(handle, result, 1, lines, more)
+
+    def next_page(self, handle):
+        handle = handle.strip()
+        with self.lock:
+            result = self.results.pop(handle, None)
+        if result is None:
+            return f"Error: there is no open result with handle {handle}; it is finished or has expired. Run the query again."
+        start, perf_start = time.time(), time.perf_counter()
+        try:
+            first, lines, more = self._page(result)
+        except sqlite3.Error as e:
+            self._close(result)
+            tracer.sql(result["query"], start, time.perf_counter() - perf_start, error=str(e), name="next_page")
+            return f"Error: {e}"
+        tracer.sql(result["query"], start, time.perf_counter() - perf_start, rows=len(lines), name="next_page")
+        if more:
+            self._keep(handle, result)
+        else:
+            self._close(result)
+        return self._format(handle, result, first, lines, more)
+
+    def close_all(self):
+        self._stop.set()
+        with self.lock:
+            while self.results:
+                self._close(self.results.popitem()[1])
+
+
+class PagedQueryTool(ReadOnlyQueryTool):
+    """sql_db_query that returns one page of rows and a handle for the rest"""
+
+    pager: Any = Field(exclude=True)
+    description: str = """
+    Execute a SQL query against the database and get back the result.
+    Long results are returned one page at a time; use sql_db_next_page with the given handle for more rows.
+    If the query is not correct, an error message will be returned.
+    If an error is returned, rewrite the query, check the query, and try again.
+    """
+
+    def _execute(self, query):
+        return self.pager.open(query)
+
+
+class _NextPageInput(BaseModel):
+    handle: str = Field(..., description="The handle returned with the previous page of results.")
+
+
+class NextPageTool(BaseTool):
+    """Continues a result of sql_db_query without running the query again"""
+
+    pager: Any = Field(exclude=True)
+    name: str = "sql_db_next_page"
+    description: str = "Get the next page of rows of a sql_db_query result that said more rows are available."
+    args_schema: Type[BaseModel] = _NextPageInput
+
+    def _run(self, handle: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        return self.pager.next_page(handle)
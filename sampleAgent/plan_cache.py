@@ -0,0 +1,145 @@
+import re
+import time
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+# Name of the toolkit tool whose successful statements are remembered
+QUERY_TOOL = "sql_db_query"
+
+# Tools that only help write the statement; a turn that called any other tool (a chart, the
+# next page of a result, the sales aggregates) used more than the replayed SQL to answer
+LOOKUP_TOOLS = {"sql_db_list_tables", "sql_db_schema", "sql_db_query_checker", "search_proper_nouns"}
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+def last_question(messages):
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content
+    return None
+
+def successful_sql(messages):
+    """The statement run through sql_db_query in the latest turn, if the answer rests on it alone.
+
+    None when the turn ran no statement without an error, ran several different ones, or
+    called a tool other than sql_db_query and the lookup tools.
+    """
+    calls = {}
+    statements = set()
+    other = False
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            calls, statements, other = {}, set(), False
+        elif isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                if call["name"] == QUERY_TOOL:
+                    calls[call["id"]] = call["args"].get("query")
+                elif call["name"] not in LOOKUP_TOOLS:
+                    other = True
+        elif isinstance(message, ToolMessage) and message.tool_call_id in calls:
+            if not str(message.content).startswith("Error"):
+                statements.add(calls[message.tool_call_id])
+    if other or len(statements) != 1:
+        return None
+    return statements.pop()
+
+
+class PlanCache:
+    """Remembers the SQL that answered a question so the next asking can skip the ReAct loop.
+
+    Questions match after normalization, or, with embeddings, when the cosine similarity of
+    their embeddings reaches threshold. Plans are tied to the database's schema_version and
+    are all dropped once the schema changes.
+    """
+
+    def __init__(self, path, db, embeddings=None, threshold=0.95):
+        self.db = db
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "question TEXT PRIMARY KEY, sql TEXT NOT NULL, schema_version INTEGER, vector BLOB, "
+            "hits INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self._vectors = None
+
+    def _invalidate(self, version):
+        deleted = self.conn.execute("DELETE FROM plans WHERE schema_version IS NOT ?", (version,)).rowcount
+        if deleted:
+            self._vectors = None
+            self.conn.commit()
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _similar(self, question):
+        if self._vectors is None:
+            rows = self.conn.execute("SELECT question, vector FROM plans WHERE vector IS NOT NULL").fetchall()
+            keys = [key for key, _ in rows]
+            matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]) if rows else None
+            self._vectors = (keys, matrix)
+        keys, matrix = self._vectors
+        if matrix is None:
+            return None
+        scores = matrix @ self._embed(question)
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.threshold else None
+
+    def lookup(self, question):
+        key = normalize_question(question)
+        version = self.db.schema_version()
+        with self.lock:
+            self._invalidate(version)
+            row = self.conn.execute("SELECT sql FROM plans WHERE question = ?", (key,)).fetchone()
+            if row is None and self.embeddings is not None:
+                similar = self._similar(question)
+                if similar is not None:
+                    key = similar
+                    row = self.conn.execute("SELECT sql FROM plans WHERE question = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE plans SET hits = hits + 1, last_used = ? WHERE question = ?", (time.time(), key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def record(self, question, sql):
+        key = normalize_question(question)
+        vector = self._embed(question).tobytes() if self.embeddings is not None else None
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO plans (question, sql, schema_version, vector, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (question) DO UPDATE SET "
+                "sql = excluded.sql, schema_version = excluded.schema_version, vector = excluded.vector, "
+                "last_used = excluded.last_used",
+                (key, sql, self.db.schema_version(), vector, now, now),
+            )
+            self.conn.commit()
+            self._vectors = None
+
+    def forget(self, sql):
+        """Drop every plan that runs sql, e.g. after it started failing"""
+        with self.lock:
+            self.conn.execute("DELETE FROM plans WHERE sql = ?", (sql,))
+            self.conn.commit()
+            self._vectors = None
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM plans")
+            self.conn.commit()
+            self._vectors = None
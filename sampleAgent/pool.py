@@ -0,0 +1,70 @@
+import time
+import sqlite3
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+from sql_cache import CachedSQLDatabase
+
+
+class ReadOnlyConnection(sqlite3.Connection):
+    """sqlite3 connection that aborts the running statement once its deadline has passed"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deadline = None
+        # The handler runs every N virtual machine instructions; a non-zero return interrupts
+        self.set_progress_handler(self._expired, 10000)
+
+    def _expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+
+def readonly_engine(
+    path,
+    pool_size=8,
+    max_overflow=4,
+    query_timeout=30.0,
+    mmap_size=256 * 1024 * 1024,
+    cache_size=-64 * 1024,
+    busy_timeout=5000,
+):
+    """SQLAlchemy engine over a pool of read-only, query-only SQLite connections"""
+
+    def connect():
+        conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False, factory=ReadOnlyConnection
+        )
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        # Negative values are KiB rather than pages
+        conn.execute(f"PRAGMA cache_size = {int(cache_size)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Wait on a checkpointing writer instead of failing with "database is locked"
+        conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+        return conn
+
+    engine = create_engine(
+        f"sqlite:///{path}",
+        creator=connect,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_deadline(conn, cursor, statement, parameters, context, executemany):
+        if query_timeout:
+            cursor.connection.deadline = time.monotonic() + query_timeout
+
+    @event.listens_for(engine, "checkin")
+    def _clear_deadline(dbapi_conn, connection_record):
+        dbapi_conn.deadline = None
+
+    return engine
+
+
+def readonly_database(path, pool_size=8, max_overflow=4, query_timeout=30.0, **kwargs):
+    """Drop-in replacement for SQLDatabase.from_uri backed by the read-only pool"""
+    # Tables are reflected on demand, or not at all when the schema catalog is warm
+    kwargs.setdefault("lazy_table_reflection", True)
+    engine = readonly_engine(path, pool_size=pool_size, max_overflow=max_overflow, query_timeout=query_timeout)
+    return CachedSQLDatabase(engine, **kwargs)
@@ -0,0 +1,145 @@
+import os
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+
+# Rough size of a llama3 token in characters, for budgets and estimates only
+CHARS_PER_TOKEN = 4
+
+def schema_summary(db):
+    """One sorted "Table(column, ...)" line per table, identical across processes for the same schema"""
+    catalog = getattr(db, "catalog", None)
+    if catalog is not None:
+        tables = {name: catalog.columns(name) for name in catalog.table_names()}
+    else:
+        tables = {
+            name: [column["name"] for column in db._inspector.get_columns(name)]
+            for name in db.get_usable_table_names()
+        }
+    return "\n".join(f"{name}({', '.join(columns)})" for name, columns in sorted(tables.items()))
+
+def stable_tools(tools):
+    """Tools in name order, so the bound tool schemas serialize the same way every run"""
+    return sorted(tools, key=lambda tool: tool.name)
+
+def compact(message, max_tokens):
+    """Cut an old tool result down to max_tokens, keeping its start"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    content = str(message.content)
+    if len(content) <= limit:
+        return message
+    content = content[:limit] + f"\n[... {len(content) - limit} characters of this earlier result omitted]"
+    return message.copy(update={"content": content})
+
+
+class PromptAssembler:
+    """Builds each model request as a fixed prefix followed by the conversation.
+
+    The system message is created once and is byte-identical for every call and every
+    process with the same schema, so Ollama can reuse the evaluated prefix. Tool results of
+    earlier turns are cut to old_tool_tokens; the cut only depends on the message itself, so
+    a compacted message reads the same in every later request and the prefix keeps matching.
+    """
+
+    def __init__(self, system, old_tool_tokens=200):
+        self.system_message = SystemMessage(content=system)
+        self.old_tool_tokens = old_tool_tokens
+
+    def __call__(self, messages):
+        # The run answering the latest question keeps its results whole: it may still need
+        # every page of a query or the schema it is rewriting a statement against
+        last_turn = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=0)
+        history = [
+            compact(message, self.old_tool_tokens) if isinstance(message, ToolMessage) and i < last_turn else message
+            for i, message in enumerate(messages)
+        ]
+        return [self.system_message] + history
+
+
+def prompt_text(messages):
+    return "".join(
+        f"{message.type}:{message.content}{getattr(message, 'tool_calls', '')}\n" for message in messages
+    )
+
+
+class PrefixCacheMonitor(BaseCallbackHandler):
+    """Reports how much of each prompt Ollama could serve from its prompt cache.
+
+    Ollama's prompt_eval_count only counts the tokens it had to evaluate. When a prompt starts
+    like one of the recent prompts, that prompt's token count (evaluated plus reused) sizes
+    the repeated part and the rest, and whatever Ollama did not evaluate was reused. Answers
+    replayed from the response cache never reach Ollama and are left out. The share of the
+    prompt text that repeats an earlier request is tracked alongside as the best case the
+    layout allows.
+    """
+
+    def __init__(self, history=16):
+        self.lock = threading.Lock()
+        self.history = history
+        # (prompt text, prompt tokens) of the latest requests Ollama evaluated
+        self.recent = []
+        self.runs = {}
+        self.calls = 0
+        self.prompt_chars = 0
+        self.shared_chars = 0
+        self.reused_tokens = 0
+        self.evaluated_tokens = 0
+        self.eval_seconds = 0.0
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self.lock:
+            self.runs[run_id] = prompt_text(messages[0])
+
+    def _reused(self, text, evaluated):
+        """Tokens of text that Ollama reused, and the characters it shares with a recent prompt"""
+        shared, tokens, length = 0, 0, 0
+        for previous, previous_tokens in self.recent:
+            common = len(os.path.commonprefix([previous, text]))
+            if common > shared:
+                shared, tokens, length = common, previous_tokens, len(previous)
+        if not shared:
+            return 0, 0
+        repeated = tokens * shared / length
+        expected = repeated + (len(text) - shared) * tokens / length
+        return round(min(repeated, max(0.0, expected - evaluated))), shared
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self.lock:
+            text = self.runs.pop(run_id, None)
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        info = (generation.generation_info if generation else None) or {}
+        message = getattr(generation, "message", None)
+        if "prompt_eval_count" not in info and message is not None:
+            info = message.response_metadata
+        if text is None or "prompt_eval_count" not in info or info.get("cached"):
+            return
+        evaluated = info["prompt_eval_count"]
+        with self.lock:
+            reused, shared = self._reused(text, evaluated)
+            self.recent = (self.recent + [(text, evaluated + reused)])[-self.history:]
+            self.calls += 1
+            self.prompt_chars += len(text)
+            self.shared_chars += shared
+            self.reused_tokens += reused
+            self.evaluated_tokens += evaluated
+            self.eval_seconds += info.get("prompt_eval_duration", 0) / 1e9
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            self.runs.pop(run_id, None)
+
+    def stats(self):
+        with self.lock:
+            total = self.reused_tokens + self.evaluated_tokens
+            return {
+                "calls": self.calls,
+                "prefix_reuse": self.shared_chars / self.prompt_chars if self.prompt_chars else None,
+                "cache_hit_rate": self.reused_tokens / total if total else None,
+                "reused_tokens": self.reused_tokens,
+                "evaluated_tokens": self.evaluated_tokens,
+                "prompt_eval_seconds": round(self.eval_seconds, 3),
+            }
+
+
+# Shared by every chat model created by initialize_llm
+prefix_monitor = PrefixCacheMonitor()
@@ -0,0 +1,175 @@
+import sqlite3
+import logging
+import threading
+from typing import Any
+from langchain_core.vectorstores import VectorStoreRetriever
+from embeddings import text_id
+from database import normalize_value
+
+logger = logging.getLogger(__name__)
+
+
+class LockedRetriever(VectorStoreRetriever):
+    """Retriever that embeds the query outside the index lock and only holds it for the search"""
+
+    lock: Any
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        with self.lock:
+            return self.vectorstore.similarity_search_by_vector(embedding, **self.search_kwargs)
+
+
+class IndexRefresher:
+    """Applies inserted, changed and deleted catalogue rows to a live FAISS and/or trigram index"""
+
+    def __init__(
+        self, path, sources, vector_db=None, embeddings=None, fuzzy_index=None, interval=30.0, reconcile_every=10
+    ):
+        self.vector_db = vector_db
+        self.embeddings = embeddings
+        self.fuzzy_index = fuzzy_index
+        self.sources = sources
+        self.interval = interval
+        self.reconcile_every = reconcile_every
+        self.lock = threading.Lock()
+
+        # data_version only moves when *another* connection commits, so this one stays private
+        self.conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False, isolation_level=None
+        )
+        self.data_version = None
+        self.changes = 0
+        self.watermarks = {table: 0 for table in sources}
+        self.rows = {table: {} for table in sources}
+        self.refcounts = {}
+        self.pending = {}
+        if vector_db is not None:
+            self.indexed = set(vector_db.index_to_docstore_id.values())
+        else:
+            self.indexed = set(fuzzy_index.texts)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _normalize(self, value):
+        if not value:
+            return None
+        return normalize_value(value) or None
+
+    def _set_row(self, table, rowid, value, touched):
+        old = self.rows[table].get(rowid)
+        text = self._normalize(value)
+        new = text_id(text) if text else None
+        if old == new:
+            return
+        if old:
+            self.refcounts[old] -= 1
+            touched.setdefault(old, None)
+        if new:
+            self.refcounts[new] = self.refcounts.get(new, 0) + 1
+            touched[new] = text
+            self.rows[table][rowid] = new
+        else:
+            self.rows[table].pop(rowid, None)
+
+    def _scan(self, table, column, touched, full):
+        watermark = 0 if full else self.watermarks[table]
+        seen = set()
+        cursor = self.conn.execute(
+            f'SELECT rowid, "{column}" FROM "{table}" WHERE rowid > ? ORDER BY rowid', (watermark,)
+        )
+        for rowid, value in cursor:
+            seen.add(rowid)
+            self._set_row(table, rowid, value, touched)
+            # Rows without a usable value are kept as None, so the table's row count can
+            # still be compared with the rows tracked here
+            self.rows[table].setdefault(rowid, None)
+            self.watermarks[table] = max(self.watermarks[table], rowid)
+        if full:
+            for rowid in [rowid for rowid in self.rows[table] if rowid not in seen]:
+                self._set_row(table, rowid, None, touched)
+                self.rows[table].pop(rowid, None)
+
+    def refresh(self):
+        """Bring the index up to date, returning the number of added and removed entries"""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.data_version and not self.pending:
+            return 0, 0
+        first = self.data_version is None
+
+        # Rows whose embedding failed last time are retried even if nothing else changed
+        touched, self.pending = self.pending, {}
+        if version != self.data_version:
+            self.data_version = version
+            self.changes += 1
+            self.conn.execute("BEGIN")
+            try:
+                for table, column in self.sources.items():
+                    # Inserts are picked up from the rowid high-watermark. Deletes show up as a row
+                    # count mismatch, in-place updates are caught by the periodic full reconcile.
+                    full = first or self.changes % self.reconcile_every == 0
+                    self._scan(table, column, touched, full)
+                    if not full:
+                        count = self.conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+                        if count != len(self.rows[table]):
+                            self._scan(table, column, touched, True)
+            finally:
+                self.conn.execute("COMMIT")
+
+        if first:
+            for key in self.indexed:
+                touched.setdefault(key, None)
+        to_add = {key: text for key, text in touched.items() if self.refcounts.get(key) and key not in self.indexed}
+        to_remove = [key for key in touched if not self.refcounts.get(key) and key in self.indexed]
+
+        # Removals need no embedding, so they are applied first and a failed embedding call
+        # cannot leave deleted names behind in either index
+        if to_remove:
+            if self.vector_db is not None:
+                with self.lock:
+                    self.vector_db.delete(to_remove)
+            if self.fuzzy_index is not None:
+                for key in to_remove:
+                    self.fuzzy_index.remove(key)
+            self.indexed.difference_update(to_remove)
+
+        # Embedding is the slow part and happens before the index is locked
+        if self.vector_db is not None and to_add:
+            try:
+                vectors = self.embeddings.embed_documents(list(to_add.values()))
+            except Exception:
+                self.pending = to_add
+                raise
+            with self.lock:
+                self.vector_db.add_embeddings(zip(to_add.values(), vectors), ids=list(to_add.keys()))
+        if self.fuzzy_index is not None:
+            for text in to_add.values():
+                self.fuzzy_index.add(text)
+        self.indexed.update(to_add)
+        return len(to_add), len(to_remove)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                added, removed = self.refresh()
+                if added or removed:
+                    logger.info("Proper noun index refreshed: %d added, %d removed", added, removed)
+            except Exception:
+                logger.exception("Proper noun index refresh failed")
+
+    def start(self):
+        self.refresh()
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="index-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def as_retriever(self, **search_kwargs):
+        return LockedRetriever(vectorstore=self.vector_db, search_kwargs=search_kwargs, lock=self.lock)
@@ -0,0 +1,120 @@
+import json
+import time
+import asyncio
+import logging
+import argparse
+from aiohttp import web
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+
+class AgentServer:
+    """Builds the agent once in the background and answers questions over HTTP with SSE streaming"""
+
+    def __init__(self, build_agent, max_concurrency=8, model_metrics=None, metrics=None):
+        self.build_agent = build_agent
+        self.model_metrics = model_metrics
+        self.metrics = metrics
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.agent = None
+        self.error = None
+        self.ready = asyncio.Event()
+        self.started = time.time()
+        self.warmup_seconds = None
+
+    async def warm_up(self, app):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            # Index building and model setup are blocking, keep the event loop serving /healthz
+            self.agent = await loop.run_in_executor(None, self.build_agent)
+            self.warmup_seconds = round(time.perf_counter() - start, 3)
+            self.ready.set()
+            logger.info("Agent ready in %.2fs", self.warmup_seconds)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Agent failed to start")
+
+    async def start_warm_up(self, app):
+        app["warm_up"] = asyncio.create_task(self.warm_up(app))
+
+    async def health(self, request):
+        return web.json_response({"status": "ok", "uptime": round(time.time() - self.started, 3)})
+
+    async def readiness(self, request):
+        body = {"ready": self.ready.is_set(), "warmup_seconds": self.warmup_seconds}
+        if self.error:
+            body["error"] = self.error
+        if self.model_metrics is not None:
+            body["models"] = self.model_metrics()
+        return web.json_response(body, status=200 if self.ready.is_set() else 503)
+
+    async def prometheus(self, request):
+        text = self.metrics() if self.metrics is not None else ""
+        return web.Response(text=text, content_type="text/plain")
+
+    async def send_event(self, response, event, data):
+        await response.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    async def ask(self, request):
+        if not self.ready.is_set():
+            return web.json_response({"error": self.error or "agent is warming up"}, status=503)
+        try:
+            question = (await request.json())["question"]
+        except (ValueError, KeyError, TypeError):
+            return web.json_response({"error": 'expected a JSON body with a "question"'}, status=400)
+
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        start = time.perf_counter()
+        async with self.semaphore:
+            try:
+                async for step in self.agent.astream({"messages": [HumanMessage(content=question)]}):
+                    for update in step.values():
+                        for message in update["messages"]:
+                            if isinstance(message, AIMessage):
+                                for call in message.tool_calls:
+                                    await self.send_event(response, "tool_call", {"name": call["name"], "args": call["args"]})
+                                if message.content and not message.tool_calls:
+                                    await self.send_event(response, "answer", {"content": message.content})
+                            elif isinstance(message, ToolMessage):
+                                await self.send_event(response, "tool", {"name": message.name, "content": message.content})
+            except Exception as e:
+                logger.exception("Question failed")
+                await self.send_event(response, "error", {"error": f"{type(e).__name__}: {e}"})
+        await self.send_event(response, "done", {"seconds": round(time.perf_counter() - start, 3)})
+        await response.write_eof()
+        return response
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/healthz", self.health)
+        app.router.add_get("/readyz", self.readiness)
+        app.router.add_get("/metrics", self.prometheus)
+        app.router.add_post("/ask", self.ask)
+        app.on_startup.append(self.start_warm_up)
+        return app
+
+
+if __name__ == "__main__":
+    import app as agent_app
+    from tracing import tracer
+
+    parser = argparse.ArgumentParser(description="Serve the SQL agent over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Questions answered at the same time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = AgentServer(
+        # Nobody answers a prompt in server mode: a missing key fails warm-up and shows in /readyz
+        lambda: agent_app.build_agent(interactive=False),
+        args.max_concurrency,
+        model_metrics=lambda: agent_app.models.metrics() if agent_app.models else {},
+        metrics=tracer.metrics.render,
+    )
+    web.run_app(server.app(), host=args.host, port=args.port)
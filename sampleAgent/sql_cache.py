@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from langchain_community.utilities import SQLDatabase
+from catalog import load_catalog
+from tracing import tracer
+
+SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+SQL_COMMENTS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|--[^\n]*|/\*.*?(?:\*/|$)", re.DOTALL)
+QUERY_START = re.compile(r"\s*(SELECT|WITH|VALUES)\b", re.IGNORECASE)
+# Opcodes of a program that writes: a write transaction (Transaction with p2 > 0) shows
+# up for any change to a table, these for the rest
+WRITE_OPCODES = {"OpenWrite", "VUpdate", "Vacuum", "JournalMode", "ParseSchema", "CreateBtree", "Destroy", "Clear"}
+
+def strip_comments(sql):
+    """Replace -- and /* */ comments outside of string literals with a space"""
+    return SQL_COMMENTS.sub(lambda m: m.group(1) or " ", sql)
+
+def normalize_sql(sql):
+    """Drop comments, collapse whitespace outside of string literals and drop the trailing semicolon"""
+    sql = SQL_TOKENS.sub(lambda m: m.group(1) or " ", strip_comments(sql)).strip()
+    return sql.rstrip(";").strip()
+
+def is_query(sql):
+    """Whether sql starts like a query; a read-only connection rejects the ones that still write"""
+    return QUERY_START.match(strip_comments(sql)) is not None
+
+def is_read_only(connection, sql):
+    """Whether sql only reads, judged from the program SQLite compiles it to.
+
+    Raises sqlite3.Error when the statement does not compile.
+    """
+    if not is_query(sql):
+        return False
+    for row in connection.cursor().execute(f"EXPLAIN {sql}"):
+        opcode, p2 = row[1], row[3]
+        if opcode in WRITE_OPCODES or (opcode == "Transaction" and p2):
+            return False
+    return True
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """SQLDatabase that keeps an LRU cache of run() results for read-only statements.
+
+    Entries are dropped as soon as the database's PRAGMA data_version or file mtime moves,
+    so writes from any connection or process invalidate the cache. With a catalog_dir, table
+    info for the sql_db_schema tool is served from a schema catalog persisted there.
+    """
+
+    def __init__(self, engine, *args, cache_entries=256, cache_bytes=8 * 1024 * 1024, catalog_dir=None, **kwargs):
+        super().__init__(engine, *args, **kwargs)
+        self.catalog_dir = catalog_dir
+        self._catalog = None
+        self.cache_entries = cache_entries
+        self.cache_bytes = cache_bytes
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._cache_lock = threading.Lock()
+        self._version = None
+
+        self._path = engine.url.database
+        self._version_conn = None
+        if self._path and self._path != ":memory:":
+            self._version_conn = sqlite3.connect(
+                f"file:{self._path}?mode=ro", uri=True, check_same_thread=False
+            )
+
+    def _data_version(self):
+        if self._version_conn is None:
+            return None
+        mtimes = []
+        for path in (self._path, self._path + "-wal"):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return (self._version_conn.execute("PRAGMA data_version").fetchone()[0], *mtimes)
+
+    def schema_version(self):
+        if self._version_conn is None:
+            return None
+        with self._cache_lock:
+            return self._version_conn.execute("PRAGMA schema_version").fetchone()[0]
+
+    @property
+    def catalog(self):
+        if self.catalog_dir is None or self._version_conn is None:
+            return None
+        version = self.schema_version()
+        if self._catalog is None or self._catalog.version != version:
+            self._catalog = load_catalog(self, self.catalog_dir, version)
+        return self._catalog
+
+    def get_table_info(self, table_names=None):
+        catalog = self.catalog
+        if catalog is None:
+            return super().get_table_info(table_names)
+        if table_names is not None:
+            missing_tables = set(table_names).difference(catalog.table_names())
+            if missing_tables:
+                raise ValueError(f"table_names {missing_tables} not found in database")
+        return catalog.table_info(table_names)
+
+    def _read_only(self, command):
+        with self._cache_lock:
+            try:
+                return is_read_only(self._version_conn, command)
+            except sqlite3.Error:
+                # Not cached; run() reports the error
+                return False
+
+    def _check_version(self):
+        version = self._data_version()
+        if version != self._version:
+            if self._cache:
+                self.invalidations += 1
+            self._cache.clear()
+            self._cache_size = 0
+            self._version = version
+
+    def _execute(self, command, fetch="all", *, parameters=None, execution_options=None):
+        start, perf_start = time.time(), time.perf_counter()
+        try:
+            result = super()._execute(command, fetch, parameters=parameters, execution_options=execution_options)
+        except Exception as e:
+            tracer.sql(str(command), start, time.perf_counter() - perf_start, error=f"{type(e).__name__}: {e}")
+            raise
+        rows = len(result) if isinstance(result, (list, tuple)) else None
+        tracer.sql(str(command), start, time.perf_counter() - perf_start, rows=rows)
+        return result
+
+    def run(self, command, fetch="all", include_columns=False, *, parameters=None, execution_options=None):
+        if (
+            self._version_conn is None
+            or not isinstance(command, str)
+            or fetch == "cursor"
+            or not self._read_only(command)
+        ):
+            return super().run(
+                command, fetch, include_columns, parameters=parameters, execution_options=execution_options
+            )
+
+        key = (
+            normalize_sql(command),
+            fetch,
+            include_columns,
+            json.dumps(parameters, sort_keys=True, default=str),
+            json.dumps(execution_options, sort_keys=True, default=str),
+        )
+        return self.cached(
+            key,
+            lambda: super(CachedSQLDatabase, self).run(
+                command, fetch, include_columns, parameters=parameters, execution_options=execution_options
+            ),
+        )
+
+    def cached(self, key, compute):
+        """compute()'s result for key, served from the cache until the database changes"""
+        if self._version_conn is None:
+            return compute()
+        with self._cache_lock:
+            self._check_version()
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+            version = self._version
+
+        result = compute()
+
+        size = len(str(result))
+        with self._cache_lock:
+            # Skip the insert if the database changed while the query was running
+            self._check_version()
+            if self._version == version and size <= self.cache_bytes:
+                if key in self._cache:
+                    self._cache_size -= len(str(self._cache.pop(key)))
+                self._cache[key] = result
+                self._cache_size += size
+                while len(self._cache) > self.cache_entries or self._cache_size > self.cache_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cache_size -= len(str(evicted))
+        return result
+
+    def cache_stats(self):
+        with self._cache_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._cache),
+                "bytes": self._cache_size,
+            }
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_size = 0
@@ -0,0 +1,74 @@
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+# Entry point modules that every agent run imports before it does any work
+DEFAULT_MODULES = ["config", "database", "llm", "agent", "utils"]
+
+# Packages that must stay behind lazy imports until a run actually needs them
+DEFAULT_FORBIDDEN = ["matplotlib", "faiss", "langchain_openai", "langchain_ollama", "langgraph.prebuilt"]
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def measure(modules, cwd):
+    """Import the modules in a fresh interpreter under -X importtime and parse its report"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [cwd, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=os.getcwd(),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({
+                "name": name,
+                "self": int(self_us) / 1e6,
+                "cumulative": int(cumulative_us) / 1e6,
+                "depth": len(indent) // 2,
+            })
+    return imports, wall
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the cold import time of the agent entry points")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--budget", type=float, default=2.0, help="Fail when imports take longer (seconds)")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN, help="Packages that must not be imported")
+    parser.add_argument("--top", type=int, default=15, help="Slowest packages to list")
+    args = parser.parse_args()
+
+    imports, wall = measure(args.modules, os.path.dirname(os.path.abspath(__file__)))
+    total = sum(entry["cumulative"] for entry in imports if entry["depth"] == 0)
+
+    print(f"{'cumulative':>11} {'self':>9}  package")
+    for entry in sorted(imports, key=lambda entry: entry["cumulative"], reverse=True)[:args.top]:
+        print(f"{entry['cumulative']:>10.3f}s {entry['self']:>8.3f}s  {'  ' * entry['depth']}{entry['name']}")
+    print(f"\nImports: {total:.3f}s (budget {args.budget:.3f}s), interpreter wall time: {wall:.3f}s")
+
+    failed = False
+    loaded = {entry["name"] for entry in imports}
+    for package in args.forbid:
+        eager = sorted(name for name in loaded if name == package or name.startswith(package + "."))
+        if eager:
+            print(f"FAIL: {package} is imported at startup ({', '.join(eager[:3])})")
+            failed = True
+    if total > args.budget:
+        print(f"FAIL: startup imports took {total:.3f}s, over the {args.budget:.3f}s budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
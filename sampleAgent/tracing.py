@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import contextvars
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.callbacks import BaseCallbackHandler
+from config import cache_dir
+
+# Upper bounds of the span duration histogram, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Tool run the current code is executing in, so SQL spans can point at the tool call that ran them
+current_tool = contextvars.ContextVar("current_tool", default=None)
+
+def new_id():
+    return uuid.uuid4().hex[:16]
+
+def model_name(kwargs):
+    params = kwargs.get("invocation_params") or {}
+    metadata = kwargs.get("metadata") or {}
+    return params.get("model") or params.get("model_name") or metadata.get("ls_model_name") or "llm"
+
+def tokens(response):
+    """Prompt and completion token counts of an LLM result, if the provider reported them"""
+    generation = response.generations[0][0] if response.generations and response.generations[0] else None
+    message = getattr(generation, "message", None)
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    info = (generation.generation_info if generation else None) or {}
+    if "prompt_eval_count" in info or "eval_count" in info:
+        return info.get("prompt_eval_count"), info.get("eval_count")
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+class JsonlSink:
+    """Appends spans as JSON lines, rotating the file once it reaches max_bytes"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+        self.file = None
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, span):
+        line = json.dumps(span, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            if self.file.tell() and self.file.tell() + len(line) > self.max_bytes:
+                self._rotate()
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class SQLiteSink:
+    """Keeps the newest max_rows spans in a SQLite table"""
+
+    def __init__(self, path, max_rows=100000):
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS spans (id INTEGER PRIMARY KEY, trace_id TEXT, span_id TEXT, parent_id TEXT,"
+            " kind TEXT, name TEXT, start REAL, seconds REAL, status TEXT, attributes TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS spans_trace ON spans (trace_id)")
+        self.writes = 0
+
+    def write(self, span):
+        attributes = {
+            key: value
+            for key, value in span.items()
+            if key not in ("trace_id", "span_id", "parent_id", "kind", "name", "start", "seconds", "status")
+        }
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO spans (trace_id, span_id, parent_id, kind, name, start, seconds, status, attributes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    span.get("trace_id"), span["span_id"], span.get("parent_id"), span["kind"], span["name"],
+                    span["start"], span["seconds"], span["status"], json.dumps(attributes, default=str),
+                ),
+            )
+            self.writes += 1
+            # Trimming on every insert would double the write cost
+            if self.writes % 1000 == 0:
+                self.conn.execute(
+                    "DELETE FROM spans WHERE id <= (SELECT MAX(id) FROM spans) - ?", (self.max_rows,)
+                )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class Metrics:
+    """Per-stage counters and duration histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.errors = defaultdict(int)
+        self.tokens = defaultdict(int)
+        self.rows = defaultdict(int)
+
+    def observe(self, span):
+        key = (span["kind"], span["name"])
+        with self.lock:
+            counts, total, count = self.durations.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if span["seconds"] <= bound:
+                    counts[i] += 1
+            self.durations[key] = (counts, total + span["seconds"], count + 1)
+            if span["status"] != "ok":
+                self.errors[key] += 1
+            for kind in ("prompt", "completion"):
+                if span.get(f"{kind}_tokens"):
+                    self.tokens[(span["name"], kind)] += span[f"{kind}_tokens"]
+            if span.get("rows"):
+                self.rows[span["name"]] += span["rows"]
+
+    def render(self):
+        def labels(**values):
+            return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in values.items()) + "}"
+
+        lines = [
+            "# HELP ollamaops_span_duration_seconds Wall time of agent stages.",
+            "# TYPE ollamaops_span_duration_seconds histogram",
+        ]
+        with self.lock:
+            for (kind, name), (counts, total, count) in sorted(self.durations.items()):
+                for bound, bucket in zip(self.buckets, counts):
+                    lines.append(f"ollamaops_span_duration_seconds_bucket{labels(kind=kind, name=name, le=bound)} {bucket}")
+                lines.append(f"ollamaops_span_duration_seconds_bucket{labels(kind=kind, name=name, le='+Inf')} {count}")
+                lines.append(f"ollamaops_span_duration_seconds_sum{labels(kind=kind, name=name)} {total:.6f}")
+                lines.append(f"ollamaops_span_duration_seconds_count{labels(kind=kind, name=name)} {count}")
+            lines += ["# HELP ollamaops_span_errors_total Failed agent stages.", "# TYPE ollamaops_span_errors_total counter"]
+            for (kind, name), count in sorted(self.errors.items()):
+                lines.append(f"ollamaops_span_errors_total{labels(kind=kind, name=name)} {count}")
+            lines += ["# HELP ollamaops_llm_tokens_total Tokens processed by the LLM.", "# TYPE ollamaops_llm_tokens_total counter"]
+            for (model, kind), count in sorted(self.tokens.items()):
+                lines.append(f"ollamaops_llm_tokens_total{labels(model=model, type=kind)} {count}")
+            lines += ["# HELP ollamaops_sql_rows_total Rows returned by SQL statements.", "# TYPE ollamaops_sql_rows_total counter"]
+            for name, count in sorted(self.rows.items()):
+                lines.append(f"ollamaops_sql_rows_total{labels(name=name)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class Tracer(BaseCallbackHandler):
+    """Records a span for every agent run, LLM call, tool call and SQL statement.
+
+    Spans carry the run ids LangChain hands to callbacks, so the spans of one question share
+    a trace id and point at their parent. Each span goes to the sink (if any) and into the
+    in-process metrics. Nothing leaves the machine.
+    """
+
+    # Called in the caller's context, which is what lets tool runs set current_tool
+    run_inline = True
+
+    def __init__(self, sink=None, metrics=None):
+        self.sink = sink
+        self.metrics = metrics or Metrics()
+        self.lock = threading.Lock()
+        self.open = {}
+        self.traces = {}
+
+    def record(self, kind, name, start, seconds, status="ok", span_id=None, parent_id=None, trace_id=None, **attributes):
+        span = {
+            "trace_id": trace_id,
+            "span_id": span_id or new_id(),
+            "parent_id": parent_id,
+            "kind": kind,
+            "name": name,
+            "start": round(start, 6),
+            "seconds": round(seconds, 6),
+            "status": status,
+            **{key: value for key, value in attributes.items() if value is not None},
+        }
+        self.metrics.observe(span)
+        if self.sink is not None:
+            self.sink.write(span)
+        return span
+
+    def sql(self, statement, start, seconds, rows=None, error=None, name="query"):
+        """Record one SQL execution; called by the database and the result pager"""
+        parent = current_tool.get()
+        with self.lock:
+            trace_id = self.traces.get(parent)
+        self.record(
+            "sql",
+            name,
+            start,
+            seconds,
+            status="error" if error else "ok",
+            parent_id=str(parent) if parent else None,
+            trace_id=str(trace_id) if trace_id else None,
+            statement=statement[:500],
+            rows=rows,
+            error=error,
+        )
+
+    def _start(self, kind, name, run_id, parent_run_id, **attributes):
+        with self.lock:
+            trace_id = self.traces.get(parent_run_id, parent_run_id or run_id)
+            self.traces[run_id] = trace_id
+            self.open[run_id] = (kind, name, time.time(), time.perf_counter(), parent_run_id, attributes)
+
+    def _end(self, run_id, error=None, **attributes):
+        with self.lock:
+            trace_id = self.traces.pop(run_id, None)
+            started = self.open.pop(run_id, None)
+        if started is None:
+            return
+        kind, name, start, perf_start, parent_run_id, start_attributes = started
+        self.record(
+            kind,
+            name,
+            start,
+            time.perf_counter() - perf_start,
+            status="error" if error else "ok",
+            span_id=str(run_id),
+            parent_id=str(parent_run_id) if parent_run_id else None,
+            trace_id=str(trace_id),
+            error=error,
+            **start_attributes,
+            **attributes,
+        )
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        # Only the outermost chain is a span of its own; inner graph nodes just carry the trace id
+        if parent_run_id is None:
+            self._start("run", kwargs.get("name") or "agent", run_id, None)
+        else:
+            with self.lock:
+                self.traces[run_id] = self.traces.get(parent_run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start("llm", model_name(kwargs), run_id, parent_run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start("llm", model_name(kwargs), run_id, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens, completion_tokens = tokens(response)
+        self._end(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start("tool", serialized.get("name") or kwargs.get("name") or "tool", run_id, parent_run_id, input_chars=len(input_str))
+        current_tool.set(run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        current_tool.set(None)
+        content = str(getattr(output, "content", output))
+        # The SQL tools report failures as "Error: ..." text instead of raising
+        error = content[:200] if content.startswith("Error") else None
+        self._end(run_id, error=error, output_chars=len(content))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        current_tool.set(None)
+        self._end(run_id, error=f"{type(error).__name__}: {error}")
+
+
+def open_sink(kind=None):
+    # TRACE_SINK=jsonl (default) or sqlite picks where spans are kept; off keeps metrics only
+    kind = kind or os.environ.get("TRACE_SINK", "jsonl")
+    if kind == "off":
+        return None
+    if kind == "jsonl":
+        return JsonlSink(
+            os.path.join(cache_dir("traces"), "spans.jsonl"),
+            max_bytes=int(os.environ.get("TRACE_MAX_BYTES", 10 * 1024 * 1024)),
+        )
+    if kind == "sqlite":
+        return SQLiteSink(os.path.join(cache_dir("traces"), "spans.sqlite"))
+    raise ValueError(f"Unknown trace sink: {kind}")
+
+
+class LazySink:
+    """Opens the sink chosen by open_sink on the first span, so importing this module writes nothing"""
+
+    def __init__(self):
+        self.sink = None
+        self.lock = threading.Lock()
+
+    def write(self, span):
+        with self.lock:
+            if self.sink is None:
+                self.sink = open_sink() or False
+        if self.sink:
+            self.sink.write(span)
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serve tracer metrics on http://host:port/metrics from a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Shared by the agent, the database and the result pager
+tracer = Tracer(sink=LazySink())
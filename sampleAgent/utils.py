@@ -1,4 +1,5 @@
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+import time
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, ToolMessage
 
 def pretty_print(result):
     if "agent" in result:
@@ -15,3 +16,76 @@ def pretty_print(result):
     if "tools" in result:
         for message in result["tools"]["messages"]:
             print(f"Tool ({message.name}): {message.content}")
+
+def sep(current):
+    # Start on a new line unless nothing is printed on the current one yet
+    return "\n" if current else ""
+
+def stream_print(agent, inputs):
+    """Print tokens and tool calls as the agent produces them, then time-to-first-token and tokens/sec.
+
+    The rate only counts the time each model call spent generating, from Ollama's eval
+    duration when it reports one, or else from each call's first to last streamed token.
+    """
+    start = time.perf_counter()
+    first_token = None
+    chunks = 0
+    usage_tokens = 0
+    current = None
+    # First and last token time of each model call, keyed by message id; tool runs and the
+    # next call's prompt evaluation between calls are not generation time
+    spans = {}
+    eval_tokens = 0
+    eval_seconds = 0.0
+
+    for message, metadata in agent.stream(inputs, stream_mode="messages"):
+        if isinstance(message, AIMessageChunk):
+            for call in message.tool_call_chunks:
+                if call.get("name"):
+                    print(f"{sep(current)}Tool Call: {call['name']} with args ", end="")
+                    current = "tool"
+                if call.get("args"):
+                    print(call["args"], end="")
+            if message.content:
+                if current != ("ai", message.id):
+                    print(f"{sep(current)}AI: ", end="")
+                    current = ("ai", message.id)
+                print(message.content, end="")
+            if message.content or message.tool_call_chunks:
+                chunks += 1
+                now = time.perf_counter()
+                if first_token is None:
+                    first_token = now
+                spans[message.id] = (spans.get(message.id, (now, now))[0], now)
+            # Ollama reports its own generation time with the last chunk of each call
+            if message.response_metadata.get("eval_duration"):
+                eval_tokens += message.response_metadata.get("eval_count", 0)
+                eval_seconds += message.response_metadata["eval_duration"] / 1e9
+            if message.usage_metadata:
+                usage_tokens += message.usage_metadata.get("output_tokens", 0)
+            print(end="", flush=True)
+        elif isinstance(message, ToolMessage):
+            print(f"{sep(current)}Tool ({message.name}): {message.content}")
+            current = None
+
+    end = time.perf_counter()
+    tokens = usage_tokens or chunks
+    generating = sum(last - first for first, last in spans.values())
+    if eval_seconds:
+        tokens_per_second = eval_tokens / eval_seconds
+    else:
+        tokens_per_second = tokens / generating if generating else None
+    stats = {
+        "time_to_first_token": first_token - start if first_token else None,
+        "tokens": tokens,
+        "tokens_per_second": tokens_per_second,
+        "total_seconds": end - start,
+    }
+    print(f"{sep(current)}----")
+    if first_token:
+        print(
+            f"Time to first token: {stats['time_to_first_token']:.2f}s, "
+            f"{tokens} tokens at {stats['tokens_per_second'] or 0:.1f} tokens/s, "
+            f"total {stats['total_seconds']:.2f}s"
+        )
+    return stats
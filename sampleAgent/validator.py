@@ -0,0 +1,122 @@
+import re
+import sqlite3
+import difflib
+from typing import Optional, Type
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.tools import BaseTool
+from langchain_community.tools.sql_database.tool import BaseSQLDatabaseTool, QuerySQLDataBaseTool
+from sql_cache import is_query, is_read_only, normalize_sql, strip_comments
+
+MISSING = re.compile(r"no such (column|table): (\S+)")
+
+def statements(sql):
+    """Split on semicolons outside of comments, string literals and quoted identifiers"""
+    parts, current = [], []
+    for token in re.split(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|;)", strip_comments(sql)):
+        if token == ";":
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(token)
+    parts.append("".join(current))
+    return [part for part in parts if part.strip()]
+
+def schema_columns(db):
+    """Table name -> column names, from the schema catalog when the database has one"""
+    catalog = getattr(db, "catalog", None)
+    if catalog is not None:
+        return {name: catalog.columns(name) for name in catalog.table_names()}
+    connection = db._engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        return {
+            name: [row[1] for row in cursor.execute(f'PRAGMA table_info("{name}")')]
+            for name in db.get_usable_table_names()
+        }
+    finally:
+        connection.close()
+
+def close_matches(word, candidates, n=3):
+    lowered = {candidate.lower(): candidate for candidate in candidates}
+    return [lowered[match] for match in difflib.get_close_matches(word.lower(), list(lowered), n=n, cutoff=0.6)]
+
+def suggest(db, error):
+    """Schema names close to the table or column SQLite could not find"""
+    match = MISSING.search(error)
+    if match is None:
+        return []
+    kind, name = match.groups()
+    columns = schema_columns(db)
+    if kind == "table":
+        return close_matches(name, columns)
+    table, _, column = name.rpartition(".")
+    # A qualifier that is not a table name is an alias, which could stand for any table
+    tables = [t for t in columns if t.lower() == table.lower()] or list(columns)
+    qualified = [f"{t}.{c}" for t in tables for c in columns[t]]
+    # Compare on the column part, but name the table it belongs to
+    by_column = {}
+    for entry in qualified:
+        by_column.setdefault(entry.split(".", 1)[1], []).append(entry)
+    return [entry for match in close_matches(column, by_column) for entry in by_column[match]][:5]
+
+def validate_sql(db, sql):
+    """Check that sql is a single read-only statement that SQLite can compile against the schema.
+
+    Returns (query, None) when it is, or (None, error) with the reason and any suggested
+    schema names. The statement is only compiled with EXPLAIN, on a read-only connection, and
+    whether it writes is read off the compiled program.
+    """
+    parts = statements(sql)
+    if not parts:
+        return None, "Error: the query is empty."
+    if len(parts) > 1:
+        return None, "Error: only a single statement can be run at a time."
+    query = normalize_sql(parts[0])
+
+    connection = db._engine.raw_connection()
+    try:
+        read_only = is_read_only(connection, query)
+    except sqlite3.Error as e:
+        message = f"Error: {e}"
+        suggestions = suggest(db, str(e))
+        if suggestions:
+            message += f". Did you mean: {', '.join(suggestions)}?"
+        return None, message
+    finally:
+        connection.close()
+    if not read_only:
+        return None, "Error: only read-only SELECT statements are allowed; the database must not be modified."
+    return query, None
+
+
+class _ValidateSQLInput(BaseModel):
+    query: str = Field(..., description="The SQL query to be checked.")
+
+
+class ValidateSQLTool(BaseSQLDatabaseTool, BaseTool):
+    """Checks queries locally with SQLite instead of asking the LLM to review them"""
+
+    name: str = "sql_db_query_checker"
+    description: str = """
+    Use this tool to double check if your query is correct before executing it.
+    Always use this tool before executing a query with sql_db_query!
+    Returns the query if it is valid, or the error and suggested table or column names.
+    """
+    args_schema: Type[BaseModel] = _ValidateSQLInput
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        checked, error = validate_sql(self.db, query)
+        return error or checked
+
+
+class ReadOnlyQueryTool(QuerySQLDataBaseTool):
+    """sql_db_query that refuses anything but a single query; the connection is read-only too"""
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None):
+        if len(statements(query)) != 1 or not is_query(query):
+            return "Error: only a single read-only SELECT statement can be run; the database must not be modified."
+        return self._execute(query)
+
+    def _execute(self, query):
+        return self.db.run_no_throw(query)
@@ -1,14 +1,9 @@
 import getpass
 import os
-import ast
 import re
 
 from dotenv import load_dotenv
 from typing import Dict
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
 from langchain_community.utilities import SQLDatabase
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
@@ -58,11 +53,31 @@ toolkit = SQLDatabaseToolkit(db=db, llm=llm)
 tools = toolkit.get_tools()
 
 
+NUMBERS = re.compile(r"\b\d+\b")
+
+
+def iter_query_values(db, query, chunk_size=1000):
+    # Stream rows from the cursor instead of round-tripping db.run() through literal_eval
+    seen = set()
+    connection = db._engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        while rows := cursor.fetchmany(chunk_size):
+            for row in rows:
+                for value in row:
+                    if not value:
+                        continue
+                    value = NUMBERS.sub("", str(value)).strip()
+                    if value and value not in seen:
+                        seen.add(value)
+                        yield value
+    finally:
+        connection.close()
+
+
 def query_as_list(db, query):
-    res = db.run(query)
-    res = [el for sub in ast.literal_eval(res) for el in sub if el]
-    res = [re.sub(r"\b\d+\b", "", string).strip() for string in res]
-    return list(set(res))
+    return list(iter_query_values(db, query))
 
 
 artists = query_as_list(db, "SELECT Name FROM Artist")
@@ -92,6 +107,10 @@ class GraphDataModel(BaseModel):
 @tool
 def draw_bar_graph(data: Dict[str, float], title: str, xlabel: str, ylabel: str) -> str:
     """Draw a Bar Graph"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     countries = list(data.keys())
     values = list(data.values())
 
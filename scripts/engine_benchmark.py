@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from tool_engine import Tool, ToolEngine, shared_client
+
+# The stub Ollama server lives with the sample agent
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sampleAgent"))
+
+QUESTION = "Compare the number of albums of AC/DC, Accept, Aerosmith and Audioslave."
+
+# Seconds each tool call blocks, set from --latency
+LATENCY = 0.2
+
+def lookup_artist(name: str) -> str:
+    """Look up the albums of an artist"""
+    # Stands in for a blocking SQL or API call
+    time.sleep(LATENCY)
+    return f"{name} has 2 albums"
+
+def scripted_reply(calls):
+    """Stub model that asks for `calls` lookups at once, then answers"""
+    def reply(messages, tools):
+        if messages[-1]["role"] == "user":
+            names = ["AC/DC", "Accept", "Aerosmith", "Audioslave", "Alanis Morissette", "Alice In Chains"]
+            return {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {"function": {"name": "lookup_artist", "arguments": {"name": names[i % len(names)]}}}
+                    for i in range(calls)
+                ],
+            }
+        return {"role": "assistant", "content": "Each of them has 2 albums."}
+    return reply
+
+def start_stub(calls, port):
+    from aiohttp import web
+    from fake_ollama import FakeOllama
+
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(FakeOllama(reply=scripted_reply(calls)).app())
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{port}"
+
+async def time_engine(engine, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await engine.run([{"role": "user", "content": QUESTION}])
+        times.append(time.perf_counter() - start)
+    return times
+
+async def time_langgraph(host, model, runs):
+    from langchain_core.tools import tool
+    from langchain_core.messages import HumanMessage
+    from langchain_ollama import ChatOllama
+    from langgraph.prebuilt import create_react_agent
+
+    agent = create_react_agent(ChatOllama(model=model, base_url=host), [tool(lookup_artist)])
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await agent.ainvoke({"messages": [HumanMessage(content=QUESTION)]})
+        times.append(time.perf_counter() - start)
+    return times
+
+def report(name, times):
+    print(
+        f"{name:<28} mean {statistics.mean(times):.3f}s  p50 {statistics.median(times):.3f}s  "
+        f"max {max(times):.3f}s  ({len(times)} runs)"
+    )
+
+async def main():
+    global LATENCY
+    parser = argparse.ArgumentParser(description="Compare the async tool engine with the LangGraph ReAct agent")
+    parser.add_argument("--host", help="Ollama to benchmark against (default: an in-process stub)")
+    parser.add_argument("--model", default="llama3.1:latest")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=4, help="Tool calls the stub model makes in one round")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds each tool call blocks")
+    parser.add_argument("--port", type=int, default=11436)
+    args = parser.parse_args()
+    LATENCY = args.latency
+
+    host = args.host or start_stub(args.calls, args.port)
+    client = shared_client(host)
+    tools = [Tool(lookup_artist, name="The artist name")]
+
+    concurrent = ToolEngine(args.model, tools, client=client)
+    serial = ToolEngine(args.model, tools, client=client, max_workers=1)
+    try:
+        report("ToolEngine (concurrent)", await time_engine(concurrent, args.runs))
+        report("ToolEngine (one at a time)", await time_engine(serial, args.runs))
+    finally:
+        concurrent.close()
+        serial.close()
+    report("LangGraph create_react_agent", await time_langgraph(host, args.model, args.runs))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,11 @@
+import os
 import json
-import ollama
+import time
 import asyncio
+from tool_engine import Tool, ToolEngine, shared_client
+
+# How long Ollama keeps the model in memory between requests
+KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
 
 
 # Simulates an API call to get flight times
@@ -19,69 +24,41 @@ def get_flight_times(departure: str, arrival: str) -> str:
   return json.dumps(flights.get(key, {'error': 'Flight not found'}))
 
 
+tools = [
+  Tool(
+    get_flight_times,
+    description='Get the flight times between two cities',
+    departure='The departure city (airport code)',
+    arrival='The arrival city (airport code)',
+  ),
+]
+
+
+async def warm_up(client, model: str):
+  # An empty prompt only loads the model, so the question below does not pay for the load
+  start = time.perf_counter()
+  response = await client.generate(model=model, prompt='', keep_alive=KEEP_ALIVE)
+  print(f"Model {model} ready in {time.perf_counter() - start:.2f}s (load {response.get('load_duration', 0) / 1e9:.2f}s)")
+
+
 async def run(model: str):
-  client = ollama.AsyncClient()
+  client = shared_client()
+  await warm_up(client, model)
   # Initialize conversation with a user query
   messages = [{'role': 'user', 'content': 'What is the flight time from New York (NYC) to Los Angeles (LAX)?'}]
 
-  # First API call: Send the query and function description to the model
-  response = await client.chat(
-    model=model,
-    messages=messages,
-    tools=[
-      {
-        'type': 'function',
-        'function': {
-          'name': 'get_flight_times',
-          'description': 'Get the flight times between two cities',
-          'parameters': {
-            'type': 'object',
-            'properties': {
-              'departure': {
-                'type': 'string',
-                'description': 'The departure city (airport code)',
-              },
-              'arrival': {
-                'type': 'string',
-                'description': 'The arrival city (airport code)',
-              },
-            },
-            'required': ['departure', 'arrival'],
-          },
-        },
-      },
-    ],
-  )
-
-  # Add the model's response to the conversation history
-  messages.append(response['message'])
+  # The engine sends the function description, runs every call the model makes (several at
+  # once when it asks for more than one) and keeps going until the model answers
+  engine = ToolEngine(model, tools, client=client, keep_alive=KEEP_ALIVE)
+  try:
+    answer, stats = await engine.run(messages)
+  finally:
+    engine.close()
 
-  # Check if the model decided to use the provided function
-  if not response['message'].get('tool_calls'):
+  if not stats['tools']:
     print("The model didn't use the function. Its response was:")
-    print(response['message']['content'])
-    return
-
-  # Process function calls made by the model
-  if response['message'].get('tool_calls'):
-    available_functions = {
-      'get_flight_times': get_flight_times,
-    }
-    for tool in response['message']['tool_calls']:
-      function_to_call = available_functions[tool['function']['name']]
-      function_response = function_to_call(tool['function']['arguments']['departure'], tool['function']['arguments']['arrival'])
-      # Add function response to the conversation
-      messages.append(
-        {
-          'role': 'tool',
-          'content': function_response,
-        }
-      )
-
-  # Second API call: Get final response from the model
-  final_response = await client.chat(model=model, messages=messages)
-  print(final_response['message']['content'])
+  print(answer)
 
 
 # Run the async function
-asyncio.run(run('llama3.1'))
\ No newline at end of file
+asyncio.run(run('llama3.1'))
@@ -1,16 +1,10 @@
 import os
-import ast
 import re
 import asyncio
-import json
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 from dotenv import load_dotenv
 from typing import Dict
 from langchain_community.utilities import SQLDatabase
-import ollama
+from tool_engine import Tool, ToolEngine
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,19 +12,35 @@ load_dotenv()
 # Database setup
 db = SQLDatabase.from_uri("sqlite:///Chinook.db")
 
-# Prompt user for a question
-user_question = input("Please enter your question: ")
-
 # Function to execute SQL queries
-def query_as_list(query: str):
-    res = db.run(query)
-    # Ensure all elements are strings before applying regex and other operations
-    res = [str(el) for sub in ast.literal_eval(res) for el in sub if el]
-    res = [re.sub(r"\b\d+\b", "", string).strip() for string in res]
-    return list(set(res))
+NUMBERS = re.compile(r"\b\d+\b")
+
+def query_as_list(query: str, chunk_size: int = 1000):
+    # Stream rows from the cursor instead of round-tripping db.run() through literal_eval
+    seen = set()
+    connection = db._engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        while rows := cursor.fetchmany(chunk_size):
+            for row in rows:
+                for value in row:
+                    if not value:
+                        continue
+                    # Ensure all elements are strings before applying regex and other operations
+                    value = NUMBERS.sub("", str(value)).strip()
+                    if value and value not in seen:
+                        seen.add(value)
+    finally:
+        connection.close()
+    return list(seen)
 
 # Function to draw a bar graph
 def draw_bar_graph(data: Dict[str, float], title: str, xlabel: str, ylabel: str) -> str:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     items = list(data.keys())
     values = list(data.values())
 
@@ -44,83 +54,55 @@ def draw_bar_graph(data: Dict[str, float], title: str, xlabel: str, ylabel: str)
     plt.close()  # Close the plot to avoid memory issues
     return "Graph has been saved as bar_graph.png"
 
-# Ollama client interaction
-async def run_ollama():
-    client = ollama.AsyncClient()
-
-    # Initial system message
-    system_message = """You are an agent designed to interact with a SQL database.
-    Given an input question, create a syntactically correct SQLite query to run, then look at the results of the query and return the answer.
-    If the user asks for data analysis, visualization, or trends, follow these steps:
-    1. Generate a SQL query to retrieve the relevant data.
-    2. Analyze the data to extract meaningful insights.
-    3. If the data is suitable for visualization, create a bar graph using the draw_bar_graph tool."""
-
+# Tools the model can call; charts render in a worker process so they do not hold up SQL lookups
+tools = [
+    Tool(query_as_list, description="Execute a SQL query and return a list of results", query="The SQL query to execute"),
+    Tool(
+        draw_bar_graph,
+        executor="process",
+        timeout=60,
+        data="Data to plot",
+        title="Graph Title",
+        xlabel="X Axis Label",
+        ylabel="Y Axis Label",
+    ),
+]
+
+# Initial system message
+SYSTEM_MESSAGE = """You are an agent designed to interact with a SQL database.
+Given an input question, create a syntactically correct SQLite query to run, then look at the results of the query and return the answer.
+If the user asks for data analysis, visualization, or trends, follow these steps:
+1. Generate a SQL query to retrieve the relevant data.
+2. Analyze the data to extract meaningful insights.
+3. If the data is suitable for visualization, create a bar graph using the draw_bar_graph tool."""
+
+async def answer(user_question, engine):
+    """Answer one question; returns the answer and the engine's round, LLM and tool timings"""
     # Define the messages
     messages = [
-        {"role": "system", "content": system_message},
+        {"role": "system", "content": SYSTEM_MESSAGE},
         {"role": "user", "content": user_question}
     ]
+    # Tool rounds continue until the model answers; calls within a round run concurrently
+    return await engine.run(messages)
 
-    # Define the available tools
-    tools = [
-        {
-            'type': 'function',
-            'function': {
-                'name': 'query_as_list',
-                'description': 'Execute a SQL query and return a list of results',
-                'parameters': {
-                    'type': 'object',
-                    'properties': {
-                        'query': {'type': 'string', 'description': 'The SQL query to execute'}
-                    },
-                    'required': ['query'],
-                },
-            }
-        },
-        {
-            'type': 'function',
-            'function': {
-                'name': 'draw_bar_graph',
-                'description': 'Draw a Bar Graph',
-                'parameters': {
-                    'type': 'object',
-                    'properties': {
-                        'data': {'type': 'object', 'description': 'Data to plot'},
-                        'title': {'type': 'string', 'description': 'Graph Title'},
-                        'xlabel': {'type': 'string', 'description': 'X Axis Label'},
-                        'ylabel': {'type': 'string', 'description': 'Y Axis Label'},
-                    },
-                    'required': ['data', 'title', 'xlabel', 'ylabel'],
-                },
-            }
-        }
-    ]
+def build_engine():
+    return ToolEngine("llama3.1", tools, keep_alive=os.environ.get("OLLAMA_KEEP_ALIVE", "30m"))
 
-    # Initial chat interaction with tool calling
-    response = await client.chat(model="llama3.1", messages=messages, tools=tools)
-
-    # Check if the model decided to use a function
-    if response.get('message').get('tool_calls'):
-        for tool_call in response['message']['tool_calls']:
-            function_name = tool_call['function']['name']
-            arguments = tool_call['function']['arguments']
-
-            if function_name == 'query_as_list':
-                tool_response = query_as_list(arguments['query'])
-            elif function_name == 'draw_bar_graph':
-                # Filter out unexpected parameters before calling the function
-                valid_args = {k: arguments[k] for k in ['data', 'title', 'xlabel', 'ylabel']}
-                tool_response = draw_bar_graph(**valid_args)
-
-            # Add tool response to the conversation
-            messages.append({'role': 'tool', 'content': json.dumps(tool_response)})
-
-        # Get the final response
-        final_response = await client.chat(model="llama3.1", messages=messages)
-        print(final_response['message']['content'])
-    else:
-        print(response['message']['content'])
-
-# Run the async function
-asyncio.run(run_ollama())
+# Ollama client interaction
+async def run_ollama(user_question):
+    engine = build_engine()
+    try:
+        text, stats = await answer(user_question, engine)
+    finally:
+        engine.close()
+    print(text)
+    print(f"---- {stats['rounds']} rounds, {len(stats['tools'])} tool calls, {stats['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    # Prompt user for a question
+    user_question = input("Please enter your question: ")
+
+    # Run the async function
+    asyncio.run(run_ollama(user_question))
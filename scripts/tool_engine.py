@@ -0,0 +1,168 @@
+import json
+import time
+import typing
+import asyncio
+import inspect
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import ollama
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+
+def json_type(annotation):
+    return JSON_TYPES.get(typing.get_origin(annotation) or annotation, "string")
+
+def call_function(func, kwargs):
+    return func(**kwargs)
+
+
+class Tool:
+    """A Python function the model can call, with its JSON schema derived from the signature.
+
+    Keyword arguments name the parameter descriptions. Parameters with a default and no
+    description are left out of the schema. The function itself stays a plain module-level
+    function, so process pool workers can unpickle it by name.
+    """
+
+    def __init__(self, func, description=None, executor="thread", timeout=None, **descriptions):
+        self.func = func
+        self.name = func.__name__
+        self.executor = executor
+        self.timeout = timeout
+        hints = typing.get_type_hints(func)
+        signature = inspect.signature(func).parameters
+        required = [name for name, parameter in signature.items() if parameter.default is inspect.Parameter.empty]
+        self.parameters = [name for name in signature if name in required or name in descriptions]
+        properties = {
+            name: {"type": json_type(hints.get(name, str)), "description": descriptions.get(name, name)}
+            for name in self.parameters
+        }
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": description or (func.__doc__ or self.name).strip().splitlines()[0],
+                "parameters": {"type": "object", "properties": properties, "required": required},
+            },
+        }
+
+
+# One HTTP client per host, so every engine and round reuses the same connection pool
+_clients = {}
+
+def shared_client(host=None):
+    if host not in _clients:
+        _clients[host] = ollama.AsyncClient(host)
+    return _clients[host]
+
+
+class ToolEngine:
+    """Async tool-calling loop over the Ollama chat API.
+
+    Each round sends the conversation to the model; when it asks for tools, all calls of the
+    round run at the same time in a thread pool (or a process pool for CPU-bound tools such
+    as chart rendering), each limited to its timeout, and the results go back to the model.
+    The loop ends when the model answers without tool calls, or after max_rounds with one
+    final call that offers no tools.
+    """
+
+    def __init__(
+        self,
+        model,
+        tools,
+        client=None,
+        max_rounds=8,
+        tool_timeout=30.0,
+        max_workers=8,
+        process_workers=2,
+        keep_alive=None,
+        options=None,
+    ):
+        self.model = model
+        self.tools = {t.name: t for t in tools}
+        self.schemas = [t.schema for t in tools]
+        self.client = client or shared_client()
+        self.max_rounds = max_rounds
+        self.tool_timeout = tool_timeout
+        self.keep_alive = keep_alive
+        self.options = options
+        self.threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self.processes = ProcessPoolExecutor(max_workers=process_workers) if any(
+            t.executor == "process" for t in tools
+        ) else None
+
+    async def call_tool(self, call):
+        name = call["function"]["name"]
+        arguments = call["function"].get("arguments") or {}
+        if isinstance(arguments, str):
+            arguments = json.loads(arguments)
+        start = time.perf_counter()
+        record = {"tool": name, "args": arguments}
+        t = self.tools.get(name)
+        if t is None:
+            content = f"Error: there is no tool named {name}"
+        else:
+            # Models sometimes add parameters the function does not take
+            kwargs = {key: value for key, value in arguments.items() if key in t.parameters}
+            executor = self.processes if t.executor == "process" else self.threads
+            timeout = t.timeout or self.tool_timeout
+            loop = asyncio.get_running_loop()
+            try:
+                result = await asyncio.wait_for(loop.run_in_executor(executor, call_function, t.func, kwargs), timeout)
+                content = result if isinstance(result, str) else json.dumps(result, default=str)
+            except asyncio.TimeoutError:
+                content = f"Error: {name} did not finish within {timeout:g}s"
+            except Exception as e:
+                content = f"Error: {type(e).__name__}: {e}"
+        record["seconds"] = round(time.perf_counter() - start, 4)
+        return content, record
+
+    async def chat(self, messages, stats, tools=None):
+        llm_start = time.perf_counter()
+        response = await self.client.chat(
+            model=self.model,
+            messages=messages,
+            tools=tools,
+            keep_alive=self.keep_alive,
+            options=self.options,
+        )
+        stats["llm_calls"].append(round(time.perf_counter() - llm_start, 4))
+        stats["llm_seconds"] += stats["llm_calls"][-1]
+        stats["rounds"] += 1
+        message = response["message"]
+        messages.append(message)
+        return message
+
+    async def run(self, messages):
+        """Continue the conversation until the model answers; returns the answer and run stats.
+
+        When max_rounds runs out while the model still asks for tools, one last call without
+        tools makes it answer from the results so far, and stats["truncated"] is set.
+        """
+        messages = list(messages)
+        stats = {
+            "rounds": 0, "tools": [], "llm_calls": [], "llm_seconds": 0.0, "tool_seconds": 0.0, "truncated": False,
+        }
+        start = time.perf_counter()
+        for _ in range(self.max_rounds):
+            message = await self.chat(messages, stats, self.schemas)
+            calls = message.get("tool_calls") or []
+            if not calls:
+                break
+            tool_start = time.perf_counter()
+            results = await asyncio.gather(*(self.call_tool(call) for call in calls))
+            stats["tool_seconds"] += time.perf_counter() - tool_start
+            # Results go back in the order of the calls, which is how Ollama matches them up
+            for content, record in results:
+                messages.append({"role": "tool", "content": content})
+                stats["tools"].append(record)
+        else:
+            stats["truncated"] = True
+            message = await self.chat(messages, stats)
+        stats["seconds"] = time.perf_counter() - start
+        stats["messages"] = messages
+        return message.get("content", ""), stats
+
+    def close(self):
+        self.threads.shutdown(wait=False)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False)